@@ -0,0 +1,258 @@
+"""
+Build Artifact Helper
+Builds Pixel OS once and shares the result with every deploy script.
+Artifacts are cached by a fingerprint of the build inputs, so unchanged
+sources skip the build entirely.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+import file_hashes
+from deploy_history import timed_phase
+from process_runner import run_process
+
+# Configuration
+PROJECT_ROOT = Path(__file__).parent.parent
+DIST_DIR = "dist"
+CACHE_DIR = Path(os.getenv("OPS_CACHE_DIR", Path(__file__).parent / ".cache"))
+ARTIFACTS_DIR = CACHE_DIR / "artifacts"
+BUILDS_DIR = CACHE_DIR / "builds"
+ARTIFACT_ENV = "PIXEL_OS_ARTIFACT"
+MANIFEST_NAME = "manifest.json"
+HISTORY_LABEL = "Build"  # provider name the build phases are recorded under
+
+# Build cache
+BUILD_CACHE_ENABLED = os.getenv("OPS_BUILD_CACHE", "True").lower() == "true"
+BUILD_CACHE_MAX_BYTES = int(os.getenv("OPS_BUILD_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+# Type-check and bundle concurrently instead of `npm run build` (tsc && vite build)
+PARALLEL_BUILD = os.getenv("OPS_PARALLEL_BUILD", "True").lower() == "true"
+BUILD_TIMEOUT = 600
+TSBUILDINFO = CACHE_DIR / "tsc" / "tsconfig.tsbuildinfo"
+BUILD_STEPS = {
+    "typecheck": ["npx", "tsc", "--noEmit", "--incremental", "--tsBuildInfoFile", str(TSBUILDINFO)],
+    "bundle": ["npx", "vite", "build"],
+}
+
+# Everything that can change the output of `npm run build`
+BUILD_INPUTS = [
+    "src",
+    "public",
+    "index.html",
+    "package.json",
+    "package-lock.json",
+    "vite.config.ts",
+    "tsconfig.json",
+]
+
+
+def run_build_step(step: str, results: dict):
+    """Run one build command, recorded as a phase of the build."""
+    with timed_phase(HISTORY_LABEL, step):
+        results[step] = run_process(BUILD_STEPS[step], cwd=str(PROJECT_ROOT), timeout=BUILD_TIMEOUT)
+        if results[step]["returncode"] != 0:
+            raise RuntimeError(f"{step} failed")
+
+
+def build_project() -> bool:
+    """Run the production build into dist.
+
+    tsc only type-checks (noEmit), so it runs alongside vite build instead
+    of before it, keeping its incremental state in the ops cache. The build
+    fails if either step fails.
+    """
+    print("📦 Building project...")
+    if not PARALLEL_BUILD:
+        result = run_process(["npm", "run", "build"], cwd=str(PROJECT_ROOT), timeout=BUILD_TIMEOUT)
+        if result["returncode"] != 0:
+            print(f"❌ Build failed: {result['tail']}")
+            print(f"📄 Full log: {result['log_path']}")
+            return False
+        print(f"✅ Build successful ({result['duration']:.1f}s)")
+        return True
+
+    TSBUILDINFO.parent.mkdir(parents=True, exist_ok=True)
+    start = time.time()
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(BUILD_STEPS)) as pool:
+        futures = [pool.submit(run_build_step, step, results) for step in BUILD_STEPS]
+    failed = [step for step, future in zip(BUILD_STEPS, futures) if future.exception()]
+
+    if failed:
+        for step in failed:
+            result = results[step]
+            print(f"❌ Build failed ({step}): {result['tail']}")
+            print(f"📄 Full log: {result['log_path']}")
+        return False
+
+    timings = ", ".join(f"{step} {results[step]['duration']:.1f}s" for step in BUILD_STEPS)
+    print(f"✅ Build successful ({time.time() - start:.1f}s; {timings})")
+    return True
+
+
+def build_manifest(dist_path: Path) -> dict:
+    """Hash every file under dist and return the artifact manifest."""
+    files = file_hashes.hash_tree(dist_path)
+
+    encoded = json.dumps(files, sort_keys=True, separators=(",", ":")).encode()
+    return {
+        "id": hashlib.sha256(encoded).hexdigest(),
+        "created": time.time(),
+        "files": files,
+    }
+
+
+def create_artifact(dist_path: Path) -> Path:
+    """Snapshot dist into a content-addressed artifact directory."""
+    manifest = build_manifest(dist_path)
+    artifact_path = ARTIFACTS_DIR / manifest["id"]
+
+    if (artifact_path / MANIFEST_NAME).exists():
+        file_hashes.seed_index(artifact_path / DIST_DIR, manifest["files"])
+        return artifact_path
+
+    # Copy into a staging dir first so a half-written artifact is never visible
+    staging = ARTIFACTS_DIR / f".{manifest['id']}.{os.getpid()}.tmp"
+    if staging.exists():
+        shutil.rmtree(staging)
+    shutil.copytree(dist_path, staging / DIST_DIR)
+    (staging / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2))
+
+    try:
+        staging.rename(artifact_path)
+    except OSError:
+        # Another process published the same artifact first
+        shutil.rmtree(staging, ignore_errors=True)
+
+    # Providers hash the artifact's copy of dist; give them the digests already
+    # in the manifest instead of having each one re-read the whole bundle
+    file_hashes.seed_index(artifact_path / DIST_DIR, manifest["files"])
+    return artifact_path
+
+
+def load_manifest(artifact_path: Path) -> dict:
+    """Read the manifest of an artifact."""
+    return json.loads((Path(artifact_path) / MANIFEST_NAME).read_text())
+
+
+def source_fingerprint() -> str:
+    """Hash the build inputs into a single fingerprint."""
+    files = []
+    for name in BUILD_INPUTS:
+        path = PROJECT_ROOT / name
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob("*") if p.is_file()))
+        elif path.is_file():
+            files.append(path)
+
+    digests = file_hashes.hash_files(files)
+    digest = hashlib.sha256()
+    for file in files:
+        relative = str(file.relative_to(PROJECT_ROOT)).replace("\\", "/")
+        digest.update(relative.encode() + b"\0" + digests[file]["sha256"].encode() + b"\n")
+    return digest.hexdigest()
+
+
+def touch_artifact(artifact_path: Path):
+    """Mark an artifact as recently used for LRU eviction."""
+    os.utime(artifact_path / MANIFEST_NAME)
+
+
+def lookup_build(fingerprint: str) -> Path | None:
+    """Return the cached artifact for a source fingerprint, if still present."""
+    entry = BUILDS_DIR / fingerprint
+    if not entry.exists():
+        return None
+    artifact_path = ARTIFACTS_DIR / entry.read_text().strip()
+    if not (artifact_path / MANIFEST_NAME).exists():
+        entry.unlink(missing_ok=True)
+        return None
+    touch_artifact(artifact_path)
+    return artifact_path
+
+
+def record_build(fingerprint: str, artifact_path: Path):
+    """Remember which artifact a source fingerprint produced."""
+    BUILDS_DIR.mkdir(parents=True, exist_ok=True)
+    (BUILDS_DIR / fingerprint).write_text(artifact_path.name)
+
+
+def evict_artifacts(keep: Path | None = None, max_bytes: int = BUILD_CACHE_MAX_BYTES):
+    """Delete least recently used artifacts until the cache fits in max_bytes."""
+    if not ARTIFACTS_DIR.exists():
+        return
+
+    entries = []
+    for artifact_path in ARTIFACTS_DIR.iterdir():
+        manifest_file = artifact_path / MANIFEST_NAME
+        if not manifest_file.exists():
+            continue
+        manifest = load_manifest(artifact_path)
+        size = sum(f["size"] for f in manifest["files"].values())
+        entries.append((manifest_file.stat().st_mtime, size, artifact_path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, artifact_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep and artifact_path.name == Path(keep).name:
+            continue
+        shutil.rmtree(artifact_path, ignore_errors=True)
+        file_hashes.prune_index(artifact_path)
+        total -= size
+
+
+def build_cached(build_project: Callable[[], bool]) -> Path | None:
+    """Return an artifact for the current sources, building only on a cache miss."""
+    fingerprint = source_fingerprint() if BUILD_CACHE_ENABLED else None
+    if fingerprint:
+        artifact_path = lookup_build(fingerprint)
+        if artifact_path:
+            print(f"⚡ Build cache hit ({fingerprint[:12]}), skipping build")
+            return artifact_path
+
+    with timed_phase(HISTORY_LABEL, "build"):
+        if not build_project():
+            return None
+
+    with timed_phase(HISTORY_LABEL, "hash") as counters:
+        artifact_path = create_artifact(PROJECT_ROOT / DIST_DIR)
+        files = load_manifest(artifact_path)["files"]
+        counters.update(files=len(files), bytes=sum(info["size"] for info in files.values()))
+    touch_artifact(artifact_path)
+    if fingerprint:
+        record_build(fingerprint, artifact_path)
+        evict_artifacts(keep=artifact_path)
+    return artifact_path
+
+
+def artifact_from_env() -> Path | None:
+    """Return the artifact handed over by deploy_all.py, if any."""
+    value = os.getenv(ARTIFACT_ENV)
+    if not value:
+        return None
+    artifact_path = Path(value)
+    if not (artifact_path / MANIFEST_NAME).exists():
+        print(f"⚠️ Ignoring invalid {ARTIFACT_ENV}: {artifact_path}")
+        return None
+    return artifact_path
+
+
+def resolve_dist(build_project: Callable[[], bool]) -> Path | None:
+    """Return the dist directory to deploy, building only when run standalone."""
+    artifact_path = artifact_from_env()
+    if artifact_path:
+        print(f"📦 Using shared build artifact {artifact_path.name[:12]}")
+        return artifact_path / DIST_DIR
+
+    artifact_path = build_cached(build_project)
+    if not artifact_path:
+        return None
+    return artifact_path / DIST_DIR
@@ -0,0 +1,261 @@
+"""
+Bundle Size Budgets
+Inventories the chunks of a build artifact (raw, gzip and brotli sizes),
+checks them against per-chunk and total budgets and diffs them against the
+last released bundle, so a chunk that balloons stops the release instead of
+scrolling past as a Vite warning.
+
+Usage: python bundle_budget.py [artifact dir]  (defaults to the build of the current sources)
+"""
+
+import fnmatch
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import events
+import precompress
+import profiling
+from build_artifact import CACHE_DIR, DIST_DIR, artifact_from_env, load_manifest, lookup_build, source_fingerprint
+from site_headers import HASHED_NAME
+
+# Configuration
+MODE = os.getenv("BUNDLE_BUDGET_MODE", "block").lower()  # block, warn or off
+METRIC = "gzip"  # budgets are on transfer size; brotli is optional on the build machine
+# Brotli sizes are informational only and quality 11 is slow, so they are opt-in
+REPORT_BROTLI = os.getenv("BUNDLE_REPORT_BROTLI", "False").lower() == "true"
+CHUNK_BUDGET_KB = int(os.getenv("BUNDLE_CHUNK_BUDGET_KB", "1024"))
+INITIAL_BUDGET_KB = int(os.getenv("BUNDLE_INITIAL_BUDGET_KB", "250"))  # what index.html loads up front
+TOTAL_BUDGET_KB = int(os.getenv("BUNDLE_TOTAL_BUDGET_KB", "8192"))
+GROWTH_LIMIT = float(os.getenv("BUNDLE_GROWTH_LIMIT", "0.10"))  # vs. the last release
+GROWTH_MIN_BYTES = 10 * 1024  # ignore growth smaller than this
+
+# Per-chunk overrides in KB, matched against the unhashed chunk name,
+# e.g. {"assets/upscale*.js": 2048}
+CHUNK_BUDGETS = {}
+
+CHUNK_TYPES = {".js", ".mjs", ".css", ".wasm"}
+INVENTORY_NAME = "bundle.json"
+BASELINE_PATH = CACHE_DIR / "bundle-baseline.json"
+HTML_ASSET = re.compile(r"""(?:src|href)=["']/?([^"'?#]+)""")
+REPORT_TOP = 10
+
+
+def chunk_name(path: str) -> str:
+    """Strip Vite's content hash, so a chunk keeps its name across releases."""
+    return HASHED_NAME.sub("", path)
+
+
+def encodings() -> list[str]:
+    """Return the encodings chunks are sized in: the budget metric, plus brotli if asked for."""
+    extra = ["br"] if REPORT_BROTLI and "br" in precompress.encodings() else []
+    return extra + [METRIC]
+
+
+def compressed_sizes(source: Path, sha256: str) -> dict[str, int]:
+    """Return {encoding: size} for a file, reusing the precompression cache."""
+    wanted = encodings()
+    sizes = {}
+    for encoding in wanted:
+        cached = precompress.cache_path(sha256, encoding)
+        if cached.exists():
+            sizes[encoding] = cached.stat().st_size
+    missing = [e for e in wanted if e not in sizes]
+    if missing:
+        sizes.update(precompress.compress_file(str(source), sha256, missing))
+    return sizes
+
+
+def inventory(artifact_path: Path) -> dict:
+    """Return {"artifact", "encodings", "chunks": {name: sizes}} for an artifact.
+
+    Chunks sharing an unhashed name are summed. The result is stored in the
+    artifact, so a cached build is only inventoried once.
+    """
+    artifact_path = Path(artifact_path)
+    inventory_path = artifact_path / INVENTORY_NAME
+    wanted = encodings()
+    if inventory_path.exists():
+        cached = json.loads(inventory_path.read_text())
+        if cached["encodings"] == wanted:
+            return cached
+
+    dist_path = artifact_path / DIST_DIR
+    files = load_manifest(artifact_path)["files"]
+
+    initial = set()
+    for path in files:
+        if path.endswith(".html"):
+            initial.update(HTML_ASSET.findall((dist_path / path).read_text(encoding="utf-8", errors="replace")))
+
+    chunks = {}
+    for path, info in sorted(files.items()):
+        if Path(path).suffix.lower() not in CHUNK_TYPES:
+            continue
+        sizes = compressed_sizes(dist_path / path, info["sha256"])
+        chunk = chunks.setdefault(chunk_name(path), {"raw": 0, **{e: 0 for e in wanted}, "files": 0,
+                                                     "initial": False})
+        chunk["raw"] += info["size"]
+        for encoding, size in sizes.items():
+            chunk[encoding] += size
+        chunk["files"] += 1
+        chunk["initial"] = chunk["initial"] or path in initial
+
+    result = {"artifact": artifact_path.name, "encodings": wanted, "chunks": chunks}
+    inventory_path.write_text(json.dumps(result, indent=2))
+    return result
+
+
+def kb(size: int) -> str:
+    """Format a byte count for the report."""
+    return f"{size / 1024:.1f} KB"
+
+
+def chunk_budget(name: str) -> int:
+    """Return a chunk's budget in bytes."""
+    for pattern, budget_kb in CHUNK_BUDGETS.items():
+        if fnmatch.fnmatch(name, pattern):
+            return budget_kb * 1024
+    return CHUNK_BUDGET_KB * 1024
+
+
+def totals(chunks: dict) -> dict[str, int]:
+    """Sum the budget metric over all chunks and over the initial ones."""
+    return {
+        "total": sum(chunk[METRIC] for chunk in chunks.values()),
+        "initial": sum(chunk[METRIC] for chunk in chunks.values() if chunk["initial"]),
+    }
+
+
+def growth(current: dict, baseline: dict | None) -> list[tuple[str, int, int]]:
+    """Return (name, old, new) for chunks that changed size since the baseline."""
+    if not baseline:
+        return []
+    old_chunks = baseline["chunks"]
+    changes = []
+    for name in sorted(set(current["chunks"]) | set(old_chunks)):
+        old = old_chunks.get(name, {}).get(METRIC, 0)
+        new = current["chunks"].get(name, {}).get(METRIC, 0)
+        if old != new:
+            changes.append((name, old, new))
+    return sorted(changes, key=lambda change: change[2] - change[1], reverse=True)
+
+
+def grew_too_much(old: int, new: int) -> bool:
+    """Return True when a size grew past the allowed regression."""
+    return new - old >= GROWTH_MIN_BYTES and new > old * (1 + GROWTH_LIMIT)
+
+
+def violations(current: dict, baseline: dict | None) -> list[str]:
+    """List every budget the bundle exceeds and every regression against the baseline."""
+    problems = []
+    for name, chunk in current["chunks"].items():
+        if chunk[METRIC] > chunk_budget(name):
+            problems.append(f"{name}: {kb(chunk[METRIC])} {METRIC} over its {kb(chunk_budget(name))} budget")
+
+    sums = totals(current["chunks"])
+    if sums["initial"] > INITIAL_BUDGET_KB * 1024:
+        problems.append(f"initial load: {kb(sums['initial'])} {METRIC} over its {INITIAL_BUDGET_KB} KB budget")
+    if sums["total"] > TOTAL_BUDGET_KB * 1024:
+        problems.append(f"total: {kb(sums['total'])} {METRIC} over its {TOTAL_BUDGET_KB} KB budget")
+
+    for name, old, new in growth(current, baseline):
+        if old and grew_too_much(old, new):
+            problems.append(f"{name}: grew {kb(old)} -> {kb(new)} {METRIC} since the last release")
+    if baseline:
+        old_sums = totals(baseline["chunks"])
+        for key in ("initial", "total"):
+            if grew_too_much(old_sums[key], sums[key]):
+                problems.append(f"{key}: grew {kb(old_sums[key])} -> {kb(sums[key])} {METRIC} "
+                                f"since the last release")
+    return problems
+
+
+def load_baseline() -> dict | None:
+    """Return the inventory of the last released bundle, if one was recorded."""
+    try:
+        return json.loads(BASELINE_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(artifact_path: Path):
+    """Record an artifact's inventory as the bundle the next release is compared to."""
+    BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = BASELINE_PATH.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(inventory(artifact_path), indent=2))
+    os.replace(tmp, BASELINE_PATH)
+
+
+def print_report(current: dict, baseline: dict | None, problems: list[str]):
+    """Print the largest chunks, the diff against the last release and any violations."""
+    encodings = ["raw"] + current["encodings"]
+    chunks = current["chunks"]
+    sums = totals(chunks)
+
+    print(f"\n📏 Bundle: {len(chunks)} chunks, {kb(sums['total'])} {METRIC} "
+          f"({kb(sums['initial'])} on initial load)")
+    largest = sorted(chunks.items(), key=lambda item: item[1][METRIC], reverse=True)[:REPORT_TOP]
+    for name, chunk in largest:
+        sizes = ", ".join(f"{e} {kb(chunk[e])}" for e in encodings)
+        print(f"  {'🚀' if chunk['initial'] else '  '} {name}: {sizes}")
+
+    changes = growth(current, baseline)
+    if baseline and baseline["artifact"] != current["artifact"]:
+        print(f"\n📐 Since the last release ({baseline['artifact'][:12]}):")
+        if not changes:
+            print("  No chunk changed size")
+        for name, old, new in changes:
+            if not old:
+                print(f"  🆕 {name}: {kb(new)}")
+            elif not new:
+                print(f"  🗑️  {name}: removed ({kb(old)})")
+            else:
+                print(f"  {'📈' if new > old else '📉'} {name}: {kb(old)} -> {kb(new)} "
+                      f"({(new - old) / old:+.0%})")
+
+    if problems:
+        icon = "❌" if MODE == "block" else "⚠️"
+        print(f"\n{icon} Bundle budget exceeded:")
+        for problem in problems:
+            print(f"  • {problem}")
+    else:
+        print("✅ Bundle within budget")
+
+
+def check_artifact(artifact_path: Path) -> bool:
+    """Inventory an artifact and report it; return False when the release should stop."""
+    if MODE == "off":
+        return True
+    current = inventory(artifact_path)
+    baseline = load_baseline()
+    problems = violations(current, baseline)
+    print_report(current, baseline, problems)
+
+    sums = totals(current["chunks"])
+    events.emit(
+        "bundle", artifact=current["artifact"], chunks=len(current["chunks"]), metric=METRIC,
+        total=sums["total"], initial=sums["initial"], baseline=baseline["artifact"] if baseline else None,
+        violations=problems,
+    )
+    return not problems or MODE != "block"
+
+
+def main(artifact: str | None = None):
+    """Check the given artifact, or the cached build of the current sources."""
+    if artifact:
+        artifact_path = Path(artifact)
+    else:
+        artifact_path = artifact_from_env() or lookup_build(source_fingerprint())
+    if not artifact_path:
+        print("❌ No build artifact for the current sources, run a deploy or build first")
+        return False
+    return check_artifact(artifact_path)
+
+
+if __name__ == "__main__":
+    profiling.init()
+    success = main(sys.argv[1] if len(sys.argv) > 1 else None)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,91 @@
+"""
+Deadlines
+Carries a deploy's deadline to everything it starts: HTTP requests and
+retries (http_client), child commands (process_runner) and the worker pools
+a provider runs its uploads on. Once the deadline passes, no new request,
+batch or command starts and in-flight ones time out, so a provider reported
+as timed out really has stopped.
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+# Configuration
+# Absolute epoch deadline set by deploy_all.py for the whole release;
+# child processes inherit it through the environment
+DEADLINE_ENV = "PIXEL_OS_DEADLINE"
+
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of starting work once the deadline has passed."""
+
+
+def current() -> float | None:
+    """Return the effective deadline: the scoped one or the release's, whichever is earlier."""
+    deadlines = [float(d) for d in (_deadline.get(), os.getenv(DEADLINE_ENV)) if d]
+    return min(deadlines) if deadlines else None
+
+
+def remaining() -> float | None:
+    """Return the seconds left before the deadline, or None without one."""
+    at = current()
+    return None if at is None else at - time.time()
+
+
+def check():
+    """Raise DeadlineExceeded if the deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+
+
+def clamp(timeout: float | None) -> float | None:
+    """Shorten a timeout so it ends by the deadline; raise if it already passed."""
+    check()
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def sleep(seconds: float):
+    """Sleep, but not past the deadline."""
+    left = remaining()
+    time.sleep(seconds if left is None else max(0.0, min(seconds, left)))
+
+
+@contextmanager
+def scope(at: float | None):
+    """Run a block under an absolute deadline; a nested scope can only shorten it."""
+    outer = _deadline.get()
+    if at is None or (outer is not None and outer < at):
+        at = outer
+    token = _deadline.set(at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def bind(fn: Callable) -> Callable:
+    """Wrap fn for a worker pool so each call runs in the caller's context.
+
+    Workers then share the caller's deadline (a call starting after it
+    raises DeadlineExceeded), its retry counters and its output capture.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(_checked, fn, *args, **kwargs)
+
+    return run
+
+
+def _checked(fn: Callable, *args, **kwargs):
+    check()
+    return fn(*args, **kwargs)
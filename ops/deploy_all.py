@@ -4,12 +4,26 @@ Deploys Pixel OS to all configured platforms
 """
 
 import os
+import sqlite3
 import sys
-import subprocess
+import threading
 import time
 from pathlib import Path
 from dotenv import load_dotenv
 
+import bundle_budget
+import deadline
+import deploy_history
+import events
+import isolation_check
+import precompress
+import profiling
+import providers
+from build_artifact import ARTIFACT_ENV, HISTORY_LABEL, build_cached, build_project
+from deploy_history import timed_phase
+from process_runner import run_process
+from scheduler import run_weighted
+
 # Load environment variables
 load_dotenv()
 
@@ -21,40 +35,149 @@ ENABLE_SURGE = os.getenv("ENABLE_SURGE", "True").lower() == "true"
 ENABLE_NEOCITIES = os.getenv("ENABLE_NEOCITIES", "True").lower() == "true"
 ENABLE_GITHUB_PAGES = os.getenv("ENABLE_GITHUB_PAGES", "False").lower() == "true"
 
-TIMEOUT = 600  # 10 minutes per deployment
+TIMEOUT = 600  # 10 minutes per deployment (upper bound)
+
+# Global budget for the whole release (build + every provider)
+DEPLOY_DEADLINE = float(os.getenv("DEPLOY_DEADLINE", "1800"))
+
+# Per-provider timeouts adapt to history: p95 * factor + slack, clamped
+MIN_TIMEOUT = 60
+TIMEOUT_FACTOR = 1.5
+TIMEOUT_SLACK = 30
+MIN_SAMPLES = 3
+
+# Run provider scripts inside this interpreter (shared config, HTTP pool and
+# caches) instead of one child Python process each
+DEPLOY_IN_PROCESS = os.getenv("DEPLOY_IN_PROCESS", "True").lower() == "true"
+
+# After deploying, check which hosts actually serve the COOP/COEP/CORP headers
+VERIFY_ISOLATION = os.getenv("DEPLOY_VERIFY_ISOLATION", "True").lower() == "true"
+
+# Concurrency budget in weight units; 1 deploys one provider at a time
+MAX_CONCURRENCY = int(os.getenv("DEPLOY_MAX_CONCURRENCY", "4"))
+
+# npx-based CLIs spawn a full Node process, the direct-API uploaders do not
+NPX_WEIGHT = 2
+PYTHON_WEIGHT = 1
+
+PROVIDER_URLS = {
+    "Cloudflare Pages": "https://pixel-os.pages.dev",
+    "Netlify": "https://pixel-os.netlify.app",
+    "Vercel": "https://pixel-os.vercel.app",
+    "Surge": "https://pixel-os.surge.sh",
+    "Neocities": "https://chirag127.neocities.org",
+    "GitHub Pages": "https://chirag127.github.io/pixel-os",
+}
+
+STATUS_ICONS = {
+    "success": "✅",
+    "failed": "❌",
+    "timeout": "⏱️ ",
+    "cancelled": "🚫",
+    "skipped": "⏭️ ",
+}
+
+print_lock = threading.Lock()
+
+
+def format_usage(result: dict) -> str:
+    """Format a child's CPU time and peak RSS, when the platform reports them."""
+    if result.get("cpu_time") is None:
+        return ""
+    usage = f", cpu {result['cpu_time']:.1f}s"
+    if result.get("peak_rss") is not None:
+        usage += f", peak RSS {result['peak_rss'] / 1024 / 1024:.0f} MB"
+    return usage
 
 
-def run_deploy_script(script_name: str) -> tuple[bool, float]:
-    """Run a deployment script and return success status and duration."""
+def build_artifact() -> Path | None:
+    """Build the project once (or reuse a cached build) as a shared artifact."""
+    artifact_path = build_cached(build_project)
+    if artifact_path:
+        print(f"📦 Build artifact {artifact_path.name[:12]}")
+        if precompress.ENABLED:
+            with timed_phase(HISTORY_LABEL, "compress") as counters:
+                variants = precompress.precompress_artifact(artifact_path)
+                counters["files"] = len(variants)
+    return artifact_path
+
+
+def record_history(record, *args):
+    """Call a deploy_history recorder; history is best-effort, never fail a deploy over it."""
+    try:
+        record(*args)
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not record deploy history: {e}")
+
+
+def provider_timeout(name: str) -> float:
+    """Derive a provider's timeout from its historical p95 duration.
+
+    Only successful deploys make up the p95, so a recent timeout raises the
+    estimate to beyond how long that attempt ran; otherwise a provider that
+    outgrew its timeout (a large upload after a bundle change) would time
+    out on every release without its p95 ever moving.
+    """
+    try:
+        p95, samples = deploy_history.duration_percentile(name)
+        timed_out = deploy_history.last_timeout(name)
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not read deploy history for {name}: {e}")
+        return TIMEOUT
+    if p95 is None or samples < MIN_SAMPLES:
+        return TIMEOUT
+    estimate = max(p95, timed_out or 0)
+    return min(TIMEOUT, max(MIN_TIMEOUT, estimate * TIMEOUT_FACTOR + TIMEOUT_SLACK))
+
+
+def run_deploy_script(script_name: str, artifact_path: Path | None = None,
+                      timeout: float = TIMEOUT) -> tuple[str, float]:
+    """Run a deployment script and return its status and duration.
+
+    The script runs in-process through its deploy() entry point, or as a
+    child interpreter when DEPLOY_IN_PROCESS is off. Status is one of
+    "success", "failed" or "timeout"; the global deadline (if set) also
+    cuts the script off.
+    """
     script_path = Path(__file__).parent / script_name
 
     if not script_path.exists():
         print(f"❌ Script not found: {script_path}")
-        return False, 0
+        return "failed", 0
 
-    start_time = time.time()
+    if DEPLOY_IN_PROCESS and artifact_path:
+        result = providers.run_provider(script_name, artifact_path, timeout)
+    else:
+        env = {}
+        if artifact_path:
+            env[ARTIFACT_ENV] = str(artifact_path)
 
-    try:
-        result = subprocess.run(
-            [sys.executable, str(script_path)],
-            capture_output=True,
-            text=True,
-            timeout=TIMEOUT,
-            cwd=str(script_path.parent)
-        )
-        duration = time.time() - start_time
-
-        if result.returncode == 0:
-            return True, duration
-        else:
-            print(result.stdout)
-            print(result.stderr)
-            return False, duration
-    except subprocess.TimeoutExpired:
-        return False, TIMEOUT
-    except Exception as e:
-        print(f"Error: {e}")
-        return False, time.time() - start_time
+        # The child inherits the provider's deadline, not just the release's
+        with deadline.scope(time.time() + timeout):
+            result = run_process(
+                [sys.executable, str(script_path)],
+                cwd=str(script_path.parent),
+                timeout=timeout,
+                env=env
+            )
+
+    lines = [line for line in result["tail"].splitlines() if line.strip()]
+    events.emit(
+        "process", child=script_name, returncode=result["returncode"], timed_out=result["timed_out"],
+        duration=result["duration"], cpu_time=result["cpu_time"], peak_rss=result["peak_rss"],
+        log_path=result["log_path"], error=None if result["returncode"] == 0 or not lines else lines[-1]
+    )
+
+    if result["returncode"] == 0:
+        if result["cpu_time"] is not None:
+            with print_lock:
+                print(f"  📈 {script_name}{format_usage(result)}")
+        return "success", result["duration"]
+
+    with print_lock:
+        print(result["tail"])
+        print(f"📄 Full log: {result['log_path']}")
+    return ("timeout" if result["timed_out"] else "failed"), result["duration"]
 
 
 def main():
@@ -64,76 +187,172 @@ def main():
     print("=" * 70)
     print()
 
+    # Every child (build, provider scripts, their CLIs) inherits the deadline
+    run_id = deploy_history.current_run_id()
+    run_start = time.time()
+    release_deadline = run_start + DEPLOY_DEADLINE
+    os.environ[deadline.DEADLINE_ENV] = str(release_deadline)
+    # Provider scripts record their phases under the same run
+    os.environ[deploy_history.RUN_ENV] = run_id
+    print(f"⏳ Release budget: {DEPLOY_DEADLINE:.0f}s")
+    events.emit("run_start", run_id=run_id, budget=DEPLOY_DEADLINE, max_concurrency=MAX_CONCURRENCY)
+
     deployments = [
-        ("Cloudflare Pages", "deploy_cloudflare.py", ENABLE_CLOUDFLARE),
-        ("Netlify", "deploy_netlify.py", ENABLE_NETLIFY),
-        ("Vercel", "deploy_vercel.py", ENABLE_VERCEL),
-        ("Surge", "deploy_surge.py", ENABLE_SURGE),
-        ("Neocities", "deploy_neocities.py", ENABLE_NEOCITIES),
-        ("GitHub Pages", "deploy_github_pages.py", ENABLE_GITHUB_PAGES),
+        ("Cloudflare Pages", "deploy_cloudflare.py", ENABLE_CLOUDFLARE, PYTHON_WEIGHT),
+        ("Netlify", "deploy_netlify.py", ENABLE_NETLIFY, PYTHON_WEIGHT),
+        ("Vercel", "deploy_vercel.py", ENABLE_VERCEL, PYTHON_WEIGHT),
+        ("Surge", "deploy_surge.py", ENABLE_SURGE, NPX_WEIGHT),
+        ("Neocities", "deploy_neocities.py", ENABLE_NEOCITIES, PYTHON_WEIGHT),
+        ("GitHub Pages", "deploy_github_pages.py", ENABLE_GITHUB_PAGES, PYTHON_WEIGHT),
     ]
 
-    results = []
-
-    for name, script, enabled in deployments:
+    enabled_deployments = [d for d in deployments if d[2]]
+    for name, _, enabled, _ in deployments:
         if not enabled:
             print(f"⏭️  {name}: SKIPPED (disabled)")
-            results.append((name, None, 0))
-            continue
 
-        print(f"\n{'='*50}")
-        print(f"🔷 Deploying to {name}...")
-        print("=" * 50)
+    # Build once and hand the same artifact to every provider
+    artifact_path = None
+    if enabled_deployments:
+        build_start = time.time()
+        artifact_path = build_artifact()
+        build_status = "success" if artifact_path else "failed"
+        record_history(deploy_history.record_deployment, run_id, HISTORY_LABEL, build_start,
+                       time.time() - build_start, build_status)
+        if not artifact_path:
+            record_history(deploy_history.record_run, run_id, run_start, time.time() - run_start, "failed")
+            events.summary(run_id=run_id, success=False, duration=time.time() - run_start,
+                           error="build failed", providers=[])
+            return False
+
+        with timed_phase(HISTORY_LABEL, "budget"):
+            within_budget = bundle_budget.check_artifact(artifact_path)
+        if not within_budget:
+            print("❌ Release stopped by the bundle budget (BUNDLE_BUDGET_MODE=warn to ship anyway)")
+            record_history(deploy_history.record_run, run_id, run_start, time.time() - run_start, "failed",
+                           artifact_path.name)
+            events.summary(run_id=run_id, success=False, duration=time.time() - run_start,
+                           artifact=artifact_path.name, error="bundle budget exceeded", providers=[])
+            return False
+
+    if DEPLOY_IN_PROCESS:
+        # Import every provider up front, so config loading isn't timed per provider
+        for _, script, _, _ in enabled_deployments:
+            try:
+                providers.load(script)
+            except Exception as e:
+                # run_provider retries the import and reports that provider as failed
+                print(f"⚠️ Could not load {script}: {type(e).__name__}: {e}")
+
+    mode = "in-process" if DEPLOY_IN_PROCESS else "one process each"
+    print(f"\n🔷 Deploying to {len(enabled_deployments)} platforms "
+          f"(max concurrency {MAX_CONCURRENCY}, {mode})...")
+
+    total = len(enabled_deployments)
+    finished = []
+    fanout_start = time.time()
 
-        success, duration = run_deploy_script(script)
-        results.append((name, success, duration))
+    def on_start(name: str):
+        events.emit("provider_start", provider=name)
+        with print_lock:
+            print(f"  ▶️  {name}: started")
 
-        if success:
-            print(f"✅ {name}: SUCCESS ({duration:.1f}s)")
+    def on_finish(name: str, result: tuple[str, float], elapsed: float):
+        status, duration = result
+        events.emit("provider_end", provider=name, status=status, duration=duration, url=PROVIDER_URLS.get(name))
+        with print_lock:
+            finished.append(name)
+            print(f"  {STATUS_ICONS[status]} [{len(finished)}/{total}] {name}: {status.upper()} "
+                  f"({duration:.1f}s, {time.time() - fanout_start:.1f}s elapsed)")
+
+    def deploy(name: str, script: str) -> tuple[str, float]:
+        remaining = release_deadline - time.time()
+        if remaining <= 0:
+            # Budget ran out while this provider was queued
+            return "cancelled", 0.0
+        started = time.time()
+        with profiling.span(name, "provider"):
+            status, duration = run_deploy_script(script, artifact_path, min(provider_timeout(name), remaining))
+        record_history(deploy_history.record_deployment, run_id, name, started, duration, status)
+        return status, duration
+
+    jobs = [
+        (name, weight, lambda name=name, script=script: deploy(name, script))
+        for name, script, _, weight in enabled_deployments
+    ]
+    outcomes = run_weighted(jobs, MAX_CONCURRENCY, on_start=on_start, on_finish=on_finish)
+
+    results = []
+    for name, _, enabled, _ in deployments:
+        if enabled:
+            status, duration = outcomes[name]
+            results.append((name, status, duration))
         else:
-            print(f"❌ {name}: FAILED ({duration:.1f}s)")
+            results.append((name, "skipped", 0))
+
+    isolation = {}
+    deployed = {name: PROVIDER_URLS[name] for name, status, _ in results if status == "success"}
+    if VERIFY_ISOLATION and deployed:
+        with events.phase("isolation", sites=len(deployed)) as extra:
+            isolation = isolation_check.check_sites(deployed, isolation_check.sample_asset(artifact_path))
+            extra["isolated"] = sorted(name for name, result in isolation.items() if result["isolated"])
 
     # Summary
     print("\n" + "=" * 70)
     print("📊 DEPLOYMENT SUMMARY")
     print("=" * 70)
 
-    successful = 0
-    failed = 0
-    skipped = 0
-
-    for name, success, duration in results:
-        if success is None:
-            print(f"  ⏭️  {name}: SKIPPED")
-            skipped += 1
-        elif success:
-            print(f"  ✅ {name}: SUCCESS ({duration:.1f}s)")
-            successful += 1
+    counts = {}
+    for name, status, duration in results:
+        counts[status] = counts.get(status, 0) + 1
+        if status == "skipped":
+            print(f"  {STATUS_ICONS[status]} {name}: SKIPPED")
         else:
-            print(f"  ❌ {name}: FAILED ({duration:.1f}s)")
-            failed += 1
+            isolated = ""
+            if name in isolation:
+                isolated = ", cross-origin isolated" if isolation[name]["isolated"] else ", not isolated"
+            print(f"  {STATUS_ICONS[status]} {name}: {status.upper()} ({duration:.1f}s{isolated})")
+
+    successful = counts.get("success", 0)
+    failed = counts.get("failed", 0) + counts.get("timeout", 0) + counts.get("cancelled", 0)
+    skipped = counts.get("skipped", 0)
 
     print()
     print(f"Total: {successful} successful, {failed} failed, {skipped} skipped")
+    print(f"Deploy wall-clock: {time.time() - fanout_start:.1f}s")
     print("=" * 70)
 
+    record_history(
+        deploy_history.record_run, run_id, run_start, time.time() - run_start,
+        "success" if failed == 0 else "failed", artifact_path.name if artifact_path else None
+    )
+    print("📈 Trends: python ops/deploy_history.py")
+    if successful and bundle_budget.MODE != "off":
+        # The next release's bundle is diffed against what actually shipped
+        bundle_budget.save_baseline(artifact_path)
+
     # Deployment URLs
     print("\n📎 DEPLOYMENT URLS:")
-    urls = [
-        ("Cloudflare Pages", "https://pixel-os.pages.dev"),
-        ("Netlify", "https://pixel-os.netlify.app"),
-        ("Vercel", "https://pixel-os.vercel.app"),
-        ("Surge", "https://pixel-os.surge.sh"),
-        ("Neocities", "https://chirag127.neocities.org"),
-        ("GitHub Pages", "https://chirag127.github.io/pixel-os"),
-    ]
-
-    for name, url in urls:
+    for name, url in PROVIDER_URLS.items():
         print(f"  • {name}: {url}")
 
+    events.summary(
+        run_id=run_id,
+        success=failed == 0,
+        duration=time.time() - run_start,
+        artifact=artifact_path.name if artifact_path else None,
+        counts=counts,
+        providers=[
+            {"name": name, "status": status, "duration": duration, "url": PROVIDER_URLS.get(name),
+             "isolated": isolation[name]["isolated"] if name in isolation else None}
+            for name, status, duration in results
+        ],
+    )
+
     return failed == 0
 
 
 if __name__ == "__main__":
+    profiling.init()
     success = main()
     sys.exit(0 if success else 1)
@@ -3,13 +3,25 @@ Cloudflare Pages Deployment Script
 Deploys Pixel OS to Cloudflare Pages
 """
 
+import base64
+import hashlib
+import json
+import mimetypes
 import os
-import subprocess
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 
+import deadline
+import file_hashes
+import site_headers
+import http_client
+import profiling
+from build_artifact import build_project, resolve_dist
+from deploy_history import timed_phase
+from process_runner import run_command
+
 # Load environment variables
 load_dotenv()
 
@@ -18,51 +30,180 @@ CLOUDFLARE_ACCOUNT_ID = os.getenv("CLOUDFLARE_ACCOUNT_ID")
 CLOUDFLARE_API_TOKEN = os.getenv("CLOUDFLARE_GLOBAL_API_KEY")
 CLOUDFLARE_EMAIL = os.getenv("CLOUDFLARE_EMAIL")
 PROJECT_NAME = os.getenv("CLOUDFLARE_PROJECT_NAME", "pixel-os")
+PROVIDER = "Cloudflare Pages"
+CLOUDFLARE_USE_WRANGLER = os.getenv("CLOUDFLARE_USE_WRANGLER", "False").lower() == "true"
+API_BASE = os.getenv("CLOUDFLARE_API_URL", "https://api.cloudflare.com/client/v4")
+UPLOAD_WORKERS = int(os.getenv("CLOUDFLARE_UPLOAD_WORKERS", "3"))
 DIST_DIR = "dist"
 TIMEOUT = 300  # 5 minutes
 
+# Direct upload batching (raw bytes; payloads are base64 encoded)
+BATCH_MAX_BYTES = 16 * 1024 * 1024
+BATCH_MAX_FILES = 1000
+
+# Files Pages reads as project configuration instead of serving as assets
+CONFIG_FILES = ["_headers", "_redirects"]
+
+
+def get_headers() -> dict:
+    """Get account API headers."""
+    return {
+        "X-Auth-Email": CLOUDFLARE_EMAIL or "",
+        "X-Auth-Key": CLOUDFLARE_API_TOKEN or "",
+    }
+
+
+def asset_hash(sha256: str, remote_path: str) -> str:
+    """Return the 32-char asset key for a file.
+
+    The extension is part of the key because Pages stores the content type
+    alongside the asset.
+    """
+    extension = Path(remote_path).suffix.lstrip(".")
+    return hashlib.sha256(f"{sha256}{extension}".encode()).hexdigest()[:32]
+
+
+def get_upload_token(session) -> str | None:
+    """Fetch a short-lived JWT for the asset upload endpoints."""
+    url = f"{API_BASE}/accounts/{CLOUDFLARE_ACCOUNT_ID}/pages/projects/{PROJECT_NAME}/upload-token"
+    response = http_client.request(session, "GET", url, headers=get_headers(), timeout=30)
+    if response.status_code != 200:
+        print(f"❌ Failed to get upload token: {response.status_code} - {response.text}")
+        return None
+    return response.json()["result"]["jwt"]
+
+
+def check_missing(session, jwt: str, hashes: list[str]) -> list[str] | None:
+    """Return the asset hashes Cloudflare does not have yet."""
+    response = http_client.request(
+        session, "POST", f"{API_BASE}/pages/assets/check-missing",
+        headers={"Authorization": f"Bearer {jwt}"}, json={"hashes": hashes}, timeout=60
+    )
+    if response.status_code != 200:
+        print(f"❌ Failed to check missing assets: {response.status_code} - {response.text}")
+        return None
+    return response.json()["result"]
+
+
+def plan_batches(assets: dict[str, tuple[Path, int]], missing: list[str]) -> list[list[str]]:
+    """Group missing hashes into upload batches bounded by size and count."""
+    batches = []
+    current = []
+    current_bytes = 0
+
+    for key in sorted(missing, key=lambda k: -assets[k][1]):
+        size = assets[key][1]
+        if current and (current_bytes + size > BATCH_MAX_BYTES or len(current) >= BATCH_MAX_FILES):
+            batches.append(current)
+            current = []
+            current_bytes = 0
+        current.append(key)
+        current_bytes += size
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def upload_batch(session, jwt: str, assets: dict[str, tuple[Path, int]], batch: list[str]) -> bool:
+    """Upload one batch of assets as base64 payloads."""
+    payload = []
+    for key in batch:
+        filepath, _ = assets[key]
+        content_type = mimetypes.guess_type(filepath.name)[0] or "application/octet-stream"
+        payload.append({
+            "key": key,
+            "value": base64.b64encode(filepath.read_bytes()).decode(),
+            "metadata": {"contentType": content_type},
+            "base64": True,
+        })
 
-def run_command(cmd: list[str], cwd: str = None, timeout: int = TIMEOUT) -> tuple[bool, str]:
-    """Run a command and return success status and output."""
     try:
-        result = subprocess.run(
-            cmd,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            shell=True if sys.platform == "win32" else False
+        response = http_client.request(
+            session, "POST", f"{API_BASE}/pages/assets/upload",
+            headers={"Authorization": f"Bearer {jwt}"}, json=payload, timeout=300
         )
-        output = result.stdout + result.stderr
-        return result.returncode == 0, output
-    except subprocess.TimeoutExpired:
-        return False, f"Command timed out after {timeout}s"
+        if response.status_code == 200:
+            return True
+        print(f"Failed to upload batch of {len(batch)} assets: {response.status_code} - {response.text}")
     except Exception as e:
-        return False, str(e)
+        print(f"Failed to upload batch of {len(batch)} assets: {e}")
+    return False
 
 
-def build_project() -> bool:
-    """Build the project."""
-    print("📦 Building project...")
-    project_root = Path(__file__).parent.parent
-    success, output = run_command(["npm", "run", "build"], cwd=str(project_root))
-    if success:
-        print("✅ Build successful")
-    else:
-        print(f"❌ Build failed: {output}")
-    return success
+def create_deployment(session, manifest: dict[str, str], dist_path: Path) -> dict | None:
+    """Create the deployment from the path -> asset hash manifest."""
+    url = f"{API_BASE}/accounts/{CLOUDFLARE_ACCOUNT_ID}/pages/projects/{PROJECT_NAME}/deployments"
+    form = [("manifest", (None, json.dumps(manifest)))]
+    generated = site_headers.config_files(dist_path, "cloudflare")
+    for name in CONFIG_FILES:
+        config_file = generated.get(name, dist_path / name)
+        if config_file.exists():
+            form.append((name, (name, config_file.read_bytes())))
 
+    response = http_client.request(session, "POST", url, headers=get_headers(), files=form, timeout=120)
+    if response.status_code != 200:
+        print(f"❌ Failed to create deployment: {response.status_code} - {response.text}")
+        return None
+    return response.json()["result"]
 
-def deploy_to_cloudflare() -> bool:
-    """Deploy to Cloudflare Pages using Wrangler."""
-    print("🚀 Deploying to Cloudflare Pages...")
 
-    project_root = Path(__file__).parent.parent
-    dist_path = project_root / DIST_DIR
+def deploy_with_api(dist_path: Path) -> bool:
+    """Deploy with the Pages direct-upload API, uploading only missing assets."""
+    session = http_client.create_session(pool_size=UPLOAD_WORKERS)
 
-    if not dist_path.exists():
-        print(f"❌ Dist directory not found: {dist_path}")
-        return False
+    with timed_phase(PROVIDER, "hash") as counters:
+        files = file_hashes.hash_tree(dist_path)
+        manifest = {}
+        assets = {}
+        for path, info in files.items():
+            if path in CONFIG_FILES:
+                continue
+            key = asset_hash(info["sha256"], path)
+            manifest[f"/{path}"] = key
+            assets[key] = (dist_path / path, info["size"])
+        counters["files"] = len(files)
+
+    with timed_phase(PROVIDER, "check-missing"):
+        jwt = get_upload_token(session)
+        if not jwt:
+            return False
+        missing = check_missing(session, jwt, list(assets))
+        if missing is None:
+            return False
+
+    missing_bytes = sum(assets[key][1] for key in missing)
+    print(f"📁 {len(manifest)} files, {len(missing)} assets to upload "
+          f"({missing_bytes / 1024 / 1024:.1f} MB), {len(assets) - len(missing)} already on Cloudflare")
+
+    with timed_phase(PROVIDER, "upload") as counters:
+        counters.update(bytes=missing_bytes, files=len(missing), skipped=len(assets) - len(missing))
+        batches = plan_batches(assets, missing)
+        with ThreadPoolExecutor(max_workers=max(1, UPLOAD_WORKERS)) as pool:
+            results = list(pool.map(deadline.bind(lambda batch: upload_batch(session, jwt, assets, batch)), batches))
+        if not all(results):
+            print(f"❌ Uploaded {sum(results)}/{len(results)} batches")
+            return False
+        if missing:
+            http_client.request(
+                session, "POST", f"{API_BASE}/pages/assets/upsert-hashes",
+                headers={"Authorization": f"Bearer {jwt}"}, json={"hashes": list(assets)}, timeout=60
+            )
+
+    with timed_phase(PROVIDER, "finalize"):
+        deployment = create_deployment(session, manifest, dist_path)
+        if not deployment:
+            return False
+
+    print("✅ Deployment successful!")
+    if deployment.get("url"):
+        print(f"🌐 URL: {deployment['url']}")
+    return True
+
+
+def deploy_with_wrangler(dist_path: Path) -> bool:
+    """Deploy to Cloudflare Pages using Wrangler."""
+    project_root = Path(__file__).parent.parent
 
     # Set environment variables for Wrangler
     env = os.environ.copy()
@@ -70,13 +211,13 @@ def deploy_to_cloudflare() -> bool:
     env["CLOUDFLARE_API_TOKEN"] = CLOUDFLARE_API_TOKEN or ""
 
     # Deploy using Wrangler
-    cmd = [
-        "npx", "wrangler", "pages", "deploy", str(dist_path),
-        "--project-name", PROJECT_NAME,
-        "--commit-dirty=true"
-    ]
-
-    success, output = run_command(cmd, cwd=str(project_root))
+    with site_headers.staged_dist(dist_path, "cloudflare") as stage_path, timed_phase(PROVIDER, "upload"):
+        cmd = [
+            "npx", "wrangler", "pages", "deploy", str(stage_path),
+            "--project-name", PROJECT_NAME,
+            "--commit-dirty=true"
+        ]
+        success, output = run_command(cmd, cwd=str(project_root), timeout=TIMEOUT)
 
     if success:
         print("✅ Deployment successful!")
@@ -92,6 +233,39 @@ def deploy_to_cloudflare() -> bool:
     return success
 
 
+def deploy_to_cloudflare(dist_path: Path | None = None) -> bool:
+    """Deploy to Cloudflare Pages."""
+    print("🚀 Deploying to Cloudflare Pages...")
+
+    project_root = Path(__file__).parent.parent
+    dist_path = dist_path or project_root / DIST_DIR
+
+    if not dist_path.exists():
+        print(f"❌ Dist directory not found: {dist_path}")
+        return False
+
+    if CLOUDFLARE_USE_WRANGLER:
+        return deploy_with_wrangler(dist_path)
+    return deploy_with_api(dist_path)
+
+
+def check_config() -> bool:
+    """Report missing credentials; return True when the provider can deploy."""
+    if not CLOUDFLARE_ACCOUNT_ID:
+        print("❌ Missing CLOUDFLARE_ACCOUNT_ID")
+        return False
+    return True
+
+
+def deploy(dist_path: Path, deadline_at: float | None = None) -> bool:
+    """Provider entry point: deploy a prebuilt dist (used by deploy_all.py).
+
+    Nothing is started after deadline_at (epoch seconds), including by upload workers.
+    """
+    with deadline.scope(deadline_at):
+        return check_config() and deploy_to_cloudflare(dist_path)
+
+
 def main():
     """Main deployment function."""
     print("=" * 60)
@@ -99,16 +273,16 @@ def main():
     print("=" * 60)
 
     # Validate credentials
-    if not CLOUDFLARE_ACCOUNT_ID:
-        print("❌ Missing CLOUDFLARE_ACCOUNT_ID")
+    if not check_config():
         return False
 
     # Build
-    if not build_project():
+    dist_path = resolve_dist(build_project)
+    if not dist_path:
         return False
 
     # Deploy
-    if not deploy_to_cloudflare():
+    if not deploy_to_cloudflare(dist_path):
         return False
 
     print("\n" + "=" * 60)
@@ -119,5 +293,6 @@ def main():
 
 
 if __name__ == "__main__":
+    profiling.init()
     success = main()
     sys.exit(0 if success else 1)
@@ -0,0 +1,265 @@
+"""
+Deploy History
+Records every release, provider deploy and deploy phase in a local SQLite
+database, and reports p50/p95 trends and regressions per provider.
+
+Usage: python deploy_history.py [--window N] [--provider NAME]
+"""
+
+import argparse
+import contextlib
+import math
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import events
+import http_client
+import profiling
+
+# Configuration
+CACHE_DIR = Path(os.getenv("OPS_CACHE_DIR", Path(__file__).parent / ".cache"))
+DB_PATH = CACHE_DIR / "deploy_history.sqlite3"
+HISTORY_WINDOW = 20  # most recent successful runs used for percentiles
+REGRESSION_FACTOR = 1.25  # recent p50 this much above the baseline p50 is flagged
+MIN_BASELINE = 3
+
+# Set by deploy_all.py so phases recorded by the provider scripts join its run
+RUN_ENV = "PIXEL_OS_RUN_ID"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL,
+    artifact TEXT
+);
+CREATE TABLE IF NOT EXISTS deployments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deployments_provider ON deployments (provider, started);
+CREATE TABLE IF NOT EXISTS phases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    files INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    retries INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS phases_run ON phases (run_id, provider);
+"""
+
+_run_id = None
+
+
+def connect() -> sqlite3.Connection:
+    """Open the history database, creating it on first use."""
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def new_run_id() -> str:
+    """Return an identifier for one deploy_all.py invocation."""
+    return time.strftime("%Y%m%d-%H%M%S") + f"-{os.getpid()}"
+
+
+def current_run_id() -> str:
+    """Return the run this process belongs to (inherited from deploy_all.py)."""
+    global _run_id
+    if _run_id is None:
+        _run_id = os.getenv(RUN_ENV) or new_run_id()
+    return _run_id
+
+
+def record_run(run_id: str, started: float, duration: float, status: str, artifact: str | None = None):
+    """Store the outcome of one deploy_all.py release."""
+    with connect() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO runs (run_id, started, duration, status, artifact) VALUES (?, ?, ?, ?, ?)",
+            (run_id, started, duration, status, artifact)
+        )
+
+
+def record_deployment(run_id: str, provider: str, started: float, duration: float, status: str):
+    """Store the outcome of one provider deploy."""
+    with connect() as conn:
+        conn.execute(
+            "INSERT INTO deployments (run_id, provider, started, duration, status) VALUES (?, ?, ?, ?, ?)",
+            (run_id, provider, started, duration, status)
+        )
+
+
+def record_phase(provider: str, phase: str, started: float, duration: float,
+                 bytes: int = 0, files: int = 0, skipped: int = 0, retries: int = 0):
+    """Store the timing and counters of one deploy phase."""
+    with connect() as conn:
+        conn.execute(
+            "INSERT INTO phases (run_id, provider, phase, started, duration, bytes, files, skipped, retries) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (current_run_id(), provider, phase, started, duration, bytes, files, skipped, retries)
+        )
+
+
+@contextlib.contextmanager
+def timed_phase(provider: str, phase: str):
+    """Time a block and record it as a phase (and as events/spans, when enabled).
+
+    Yields a dict the block may fill with "bytes", "files" and "skipped";
+    HTTP retries made during the block are counted automatically.
+    """
+    with events.phase(phase, provider=provider) as counters, profiling.span(f"{provider}: {phase}", "phase"), \
+            http_client.count_retries() as retried:
+        started = time.time()
+        try:
+            yield counters
+        finally:
+            counters.setdefault("retries", retried["retries"])
+            try:
+                record_phase(provider, phase, started, time.time() - started, **counters)
+            except sqlite3.Error as e:
+                # History is best-effort; never fail a deploy over it
+                print(f"⚠️ Could not record {phase} phase: {e}")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = min(max(1, math.ceil(pct * len(ordered))), len(ordered))
+    return ordered[rank - 1]
+
+
+def duration_percentile(provider: str, pct: float = 0.95, window: int = HISTORY_WINDOW) -> tuple[float | None, int]:
+    """Return (percentile duration, sample count) over recent successful deploys."""
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT duration FROM deployments WHERE provider = ? AND status = 'success' "
+            "ORDER BY started DESC LIMIT ?",
+            (provider, window)
+        ).fetchall()
+
+    durations = [row[0] for row in rows]
+    if not durations:
+        return None, 0
+    return percentile(durations, pct), len(durations)
+
+
+def last_timeout(provider: str, window: int = HISTORY_WINDOW) -> float | None:
+    """Return how long the newest timed-out deploy among the recent ones ran, if any."""
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT duration FROM (SELECT duration, status, started FROM deployments WHERE provider = ? "
+            "ORDER BY started DESC LIMIT ?) WHERE status = 'timeout' ORDER BY started DESC LIMIT 1",
+            (provider, window)
+        ).fetchone()
+    return row[0] if row else None
+
+
+def provider_series(conn: sqlite3.Connection, provider: str, limit: int) -> list[dict]:
+    """Return the newest successful deploys of a provider with their phases, newest first."""
+    deployments = conn.execute(
+        "SELECT run_id, duration FROM deployments WHERE provider = ? AND status = 'success' "
+        "ORDER BY started DESC LIMIT ?",
+        (provider, limit)
+    ).fetchall()
+
+    series = []
+    for run_id, duration in deployments:
+        phases = {}
+        for phase, phase_duration, phase_bytes in conn.execute(
+            "SELECT phase, SUM(duration), SUM(bytes) FROM phases WHERE run_id = ? AND provider = ? GROUP BY phase",
+            (run_id, provider)
+        ):
+            phases[phase] = (phase_duration, phase_bytes)
+        series.append({"run_id": run_id, "duration": duration, "phases": phases})
+    return series
+
+
+def compare(label: str, recent: list[float], baseline: list[float]) -> str:
+    """Format p50/p95 of the recent window against the baseline window."""
+    line = f"    {label:<14} p50 {percentile(recent, 0.5):7.1f}s  p95 {percentile(recent, 0.95):7.1f}s"
+    if len(baseline) >= MIN_BASELINE:
+        before = percentile(baseline, 0.5)
+        after = percentile(recent, 0.5)
+        change = (after - before) / before * 100 if before else 0.0
+        line += f"  (was p50 {before:.1f}s, {change:+.0f}%)"
+        if before and after > before * REGRESSION_FACTOR:
+            line += "  ⚠️ REGRESSION"
+    return line
+
+
+def report(window: int = HISTORY_WINDOW, provider: str | None = None) -> bool:
+    """Print per-provider trends; return False if any regression was found."""
+    with connect() as conn:
+        if provider:
+            providers = [provider]
+        else:
+            providers = [row[0] for row in conn.execute("SELECT DISTINCT provider FROM deployments ORDER BY provider")]
+
+        print("=" * 70)
+        print(f"📈 DEPLOY HISTORY (last {window} successful deploys vs the {window} before)")
+        print("=" * 70)
+
+        if not providers:
+            print("No deployments recorded yet")
+            return True
+
+        clean = True
+        for name in providers:
+            total, succeeded = conn.execute(
+                "SELECT COUNT(*), SUM(status = 'success') FROM deployments WHERE provider = ?",
+                (name,)
+            ).fetchone()
+            series = provider_series(conn, name, window * 2)
+            recent, baseline = series[:window], series[window:]
+
+            print(f"\n🔷 {name}: {succeeded or 0}/{total} successful")
+            if not recent:
+                continue
+
+            lines = [compare("total", [s["duration"] for s in recent], [s["duration"] for s in baseline])]
+            phase_names = sorted({phase for s in recent for phase in s["phases"]})
+            for phase in phase_names:
+                lines.append(compare(
+                    phase,
+                    [s["phases"][phase][0] for s in recent if phase in s["phases"]],
+                    [s["phases"][phase][0] for s in baseline if phase in s["phases"]]
+                ))
+
+            uploaded = [s["phases"]["upload"][1] for s in recent if "upload" in s["phases"]]
+            if uploaded:
+                lines.append(f"    {'uploaded':<14} p50 {percentile(uploaded, 0.5) / 1024 / 1024:7.1f} MB")
+
+            for line in lines:
+                print(line)
+                clean = clean and "REGRESSION" not in line
+
+        print("\n" + "=" * 70)
+        return clean
+
+
+def main():
+    """Print the trend report."""
+    parser = argparse.ArgumentParser(description="Deploy history trends")
+    parser.add_argument("--window", type=int, default=HISTORY_WINDOW, help="deploys per comparison window")
+    parser.add_argument("--provider", help="only report this provider")
+    args = parser.parse_args()
+    return report(window=args.window, provider=args.provider)
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -4,118 +4,257 @@ Deploys Pixel OS to Neocities
 """
 
 import os
-import subprocess
 import sys
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from pathlib import Path
 from dotenv import load_dotenv
 
+import deadline
+import file_hashes
+import http_client
+import profiling
+from build_artifact import build_project, resolve_dist
+from deploy_history import timed_phase
+
 # Load environment variables
 load_dotenv()
 
 # Configuration
 NEOCITIES_API_KEY = os.getenv("NEOCITIES_API_KEY")
 NEOCITIES_SITENAME = os.getenv("NEOCITIES_SITENAME", "chirag127")
+PROVIDER = "Neocities"
+NEOCITIES_API_URL = os.getenv("NEOCITIES_API_URL", "https://neocities.org/api")
+NEOCITIES_DELETE_STALE = os.getenv("NEOCITIES_DELETE_STALE", "False").lower() == "true"
 DIST_DIR = "dist"
-TIMEOUT = 300
 
+# Upload tuning
+UPLOAD_WORKERS = int(os.getenv("NEOCITIES_UPLOAD_WORKERS", "4"))
+SMALL_FILE_LIMIT = 256 * 1024  # files below this are packed into batches
+BATCH_MAX_BYTES = 4 * 1024 * 1024
+BATCH_MAX_FILES = 50
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_headers() -> dict:
+    """Get API headers."""
+    return {"Authorization": f"Bearer {NEOCITIES_API_KEY}"}
+
+
+def get_session():
+    """Return the shared keep-alive session, sized for the upload pool."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = http_client.create_session(pool_size=UPLOAD_WORKERS, headers=get_headers())
+    return _session
 
-def run_command(cmd: list[str], cwd: str = None, timeout: int = TIMEOUT) -> tuple[bool, str]:
-    """Run a command and return success status and output."""
+
+def list_local_files(dist_path: Path) -> dict[str, tuple[Path, str]]:
+    """Map each remote path under dist to its local file and sha1."""
+    return {
+        relative: (dist_path / relative, digests["sha1"])
+        for relative, digests in file_hashes.hash_tree(dist_path).items()
+    }
+
+
+def list_remote_files() -> dict[str, str] | None:
+    """Fetch the site listing once and map each remote file to its sha1."""
     try:
-        result = subprocess.run(
-            cmd,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            shell=True if sys.platform == "win32" else False
-        )
-        output = result.stdout + result.stderr
-        return result.returncode == 0, output
-    except subprocess.TimeoutExpired:
-        return False, f"Command timed out after {timeout}s"
+        response = http_client.request(get_session(), "GET", f"{NEOCITIES_API_URL}/list", timeout=60)
+        if response.status_code != 200:
+            print(f"⚠️ Could not list remote files: {response.status_code}")
+            return None
+        data = response.json()
     except Exception as e:
-        return False, str(e)
+        print(f"⚠️ Could not list remote files: {e}")
+        return None
 
+    return {
+        entry["path"]: entry.get("sha1_hash", "")
+        for entry in data.get("files", [])
+        if not entry.get("is_directory")
+    }
 
-def build_project() -> bool:
-    """Build the project."""
-    print("📦 Building project...")
-    project_root = Path(__file__).parent.parent
-    success, output = run_command(["npm", "run", "build"], cwd=str(project_root))
-    if success:
-        print("✅ Build successful")
-    else:
-        print(f"❌ Build failed: {output}")
-    return success
+
+def plan_sync(local: dict[str, tuple[Path, str]], remote: dict[str, str] | None) -> tuple[list[str], list[str]]:
+    """Return (paths to upload, stale remote paths) for a local/remote pair."""
+    if remote is None:
+        return sorted(local), []
+
+    to_upload = sorted(path for path, (_, sha1) in local.items() if remote.get(path) != sha1)
+    stale = sorted(path for path in remote if path not in local)
+    return to_upload, stale
+
+
+def plan_batches(local: dict[str, tuple[Path, str]], paths: list[str]) -> list[list[str]]:
+    """Group paths into upload requests: small files packed together, large files alone."""
+    batches = []
+    current = []
+    current_bytes = 0
+
+    for path in paths:
+        size = local[path][0].stat().st_size
+        if size >= SMALL_FILE_LIMIT:
+            batches.append([path])
+            continue
+        if current and (current_bytes + size > BATCH_MAX_BYTES or len(current) >= BATCH_MAX_FILES):
+            batches.append(current)
+            current = []
+            current_bytes = 0
+        current.append(path)
+        current_bytes += size
+
+    if current:
+        batches.append(current)
+
+    # Start the largest requests first so they don't trail at the end
+    batches.sort(key=lambda batch: -sum(local[p][0].stat().st_size for p in batch))
+    return batches
+
+
+def upload_batch(local: dict[str, tuple[Path, str]], remote_paths: list[str]) -> bool:
+    """Upload one or more files to Neocities in a single request."""
+    url = f"{NEOCITIES_API_URL}/upload"
+
+    def send():
+        # Files are reopened on every attempt so retries resend the full body
+        with ExitStack() as stack:
+            files = [
+                (path, (path, stack.enter_context(open(local[path][0], "rb"))))
+                for path in remote_paths
+            ]
+            return get_session().post(url, files=files, timeout=deadline.clamp(120))
+
+    try:
+        response = http_client.with_retries(send)
+        if response.status_code == 200:
+            return True
+        print(f"Failed to upload {', '.join(remote_paths)}: {response.status_code} - {response.text}")
+    except Exception as e:
+        print(f"Failed to upload {', '.join(remote_paths)}: {e}")
+    return False
 
 
 def upload_file(filepath: Path, remote_path: str) -> bool:
     """Upload a single file to Neocities."""
-    url = "https://neocities.org/api/upload"
-    headers = {"Authorization": f"Bearer {NEOCITIES_API_KEY}"}
+    return upload_batch({remote_path: (filepath, "")}, [remote_path])
+
+
+def upload_files(local: dict[str, tuple[Path, str]], paths: list[str]) -> int:
+    """Upload paths concurrently in batches and return the number uploaded."""
+    print_lock = threading.Lock()
+
+    def run(batch: list[str]) -> int:
+        ok = upload_batch(local, batch)
+        with print_lock:
+            for path in batch:
+                print(f"  {'✅' if ok else '❌'} {path}")
+        return len(batch) if ok else 0
+
+    batches = plan_batches(local, paths)
+    with ThreadPoolExecutor(max_workers=max(1, UPLOAD_WORKERS)) as pool:
+        return sum(pool.map(deadline.bind(run), batches))
+
+
+def delete_files(remote_paths: list[str]) -> bool:
+    """Delete files from the site in a single request."""
+    url = f"{NEOCITIES_API_URL}/delete"
 
     try:
-        with open(filepath, "rb") as f:
-            files = {remote_path: (remote_path, f)}
-            response = requests.post(url, headers=headers, files=files, timeout=60)
-            return response.status_code == 200
+        data = [("filenames[]", path) for path in remote_paths]
+        response = http_client.request(get_session(), "POST", url, data=data, timeout=60)
+        if response.status_code == 200:
+            return True
+        print(f"Failed to delete stale files: {response.status_code} - {response.text}")
     except Exception as e:
-        print(f"Failed to upload {filepath}: {e}")
-        return False
+        print(f"Failed to delete stale files: {e}")
+    return False
 
 
-def deploy_to_neocities() -> bool:
-    """Deploy to Neocities using API."""
+def deploy_to_neocities(dist_path: Path | None = None) -> bool:
+    """Deploy to Neocities, uploading only new or changed files."""
     print("🚀 Deploying to Neocities...")
 
     project_root = Path(__file__).parent.parent
-    dist_path = project_root / DIST_DIR
+    dist_path = dist_path or project_root / DIST_DIR
 
     if not dist_path.exists():
         print(f"❌ Dist directory not found: {dist_path}")
         return False
 
-    # Get all files in dist
-    files_to_upload = []
-    for file in dist_path.rglob("*"):
-        if file.is_file():
-            relative = file.relative_to(dist_path)
-            files_to_upload.append((file, str(relative).replace("\\", "/")))
+    # Diff the local tree against the remote listing
+    with timed_phase(PROVIDER, "hash") as counters:
+        local = list_local_files(dist_path)
+        counters["files"] = len(local)
+    with timed_phase(PROVIDER, "check-missing"):
+        remote = list_remote_files()
+        if remote is None:
+            print("⚠️ Falling back to a full upload")
+        to_upload, stale = plan_sync(local, remote)
 
-    print(f"📁 Found {len(files_to_upload)} files to upload")
+    print(f"📁 Found {len(local)} files, {len(to_upload)} new or changed, "
+          f"{len(local) - len(to_upload)} unchanged")
+
+    with timed_phase(PROVIDER, "upload") as counters:
+        counters.update(
+            bytes=sum(local[path][0].stat().st_size for path in to_upload),
+            files=len(to_upload), skipped=len(local) - len(to_upload)
+        )
+        success_count = upload_files(local, to_upload)
 
-    success_count = 0
-    for filepath, remote_path in files_to_upload:
-        if upload_file(filepath, remote_path):
-            success_count += 1
-            print(f"  ✅ {remote_path}")
+    if stale:
+        if NEOCITIES_DELETE_STALE:
+            with timed_phase(PROVIDER, "delete") as counters:
+                counters["files"] = len(stale)
+                deleted = delete_files(stale)
+            if deleted:
+                print(f"🗑️ Deleted {len(stale)} stale remote files")
         else:
-            print(f"  ❌ {remote_path}")
+            print(f"ℹ️ {len(stale)} stale remote files kept (set NEOCITIES_DELETE_STALE=true to remove)")
 
-    if success_count == len(files_to_upload):
+    if success_count == len(to_upload):
         print("✅ All files uploaded successfully!")
         return True
     else:
-        print(f"⚠️ Uploaded {success_count}/{len(files_to_upload)} files")
+        print(f"⚠️ Uploaded {success_count}/{len(to_upload)} files")
         return success_count > 0
 
 
+def check_config() -> bool:
+    """Report missing credentials; return True when the provider can deploy."""
+    if not NEOCITIES_API_KEY:
+        print("❌ Missing NEOCITIES_API_KEY")
+        return False
+    return True
+
+
+def deploy(dist_path: Path, deadline_at: float | None = None) -> bool:
+    """Provider entry point: deploy a prebuilt dist (used by deploy_all.py).
+
+    Nothing is started after deadline_at (epoch seconds), including by upload workers.
+    """
+    with deadline.scope(deadline_at):
+        return check_config() and deploy_to_neocities(dist_path)
+
+
 def main():
     """Main deployment function."""
     print("=" * 60)
     print("🔷 Neocities Deployment")
     print("=" * 60)
 
-    if not NEOCITIES_API_KEY:
-        print("❌ Missing NEOCITIES_API_KEY")
+    if not check_config():
         return False
 
-    if not build_project():
+    dist_path = resolve_dist(build_project)
+    if not dist_path:
         return False
 
-    if not deploy_to_neocities():
+    if not deploy_to_neocities(dist_path):
         return False
 
     print("\n" + "=" * 60)
@@ -126,5 +265,6 @@ def main():
 
 
 if __name__ == "__main__":
+    profiling.init()
     success = main()
     sys.exit(0 if success else 1)
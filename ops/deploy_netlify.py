@@ -4,89 +4,209 @@ Deploys Pixel OS to Netlify
 """
 
 import os
-import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from urllib.parse import quote
 from dotenv import load_dotenv
 
+import deadline
+import http_client
+import site_headers
+import profiling
+from build_artifact import build_project, resolve_dist
+from deploy_history import timed_phase
+from process_runner import run_command
+
 # Load environment variables
 load_dotenv()
 
 # Configuration
 NETLIFY_AUTH_TOKEN = os.getenv("NETLIFY_AUTH_TOKEN")
 NETLIFY_SITE_ID = os.getenv("NETLIFY_SITE_ID")
+PROVIDER = "Netlify"
+NETLIFY_API_URL = os.getenv("NETLIFY_API_URL", "https://api.netlify.com/api/v1")
+NETLIFY_USE_CLI = os.getenv("NETLIFY_USE_CLI", "False").lower() == "true"
+UPLOAD_WORKERS = int(os.getenv("NETLIFY_UPLOAD_WORKERS", "8"))
 DIST_DIR = "dist"
 TIMEOUT = 300
+POLL_INTERVAL = 2
+
+
+def create_session():
+    """Create the pooled API session."""
+    return http_client.create_session(
+        pool_size=UPLOAD_WORKERS,
+        headers={"Authorization": f"Bearer {NETLIFY_AUTH_TOKEN}"}
+    )
+
+
+def create_deploy(session, digests: dict[str, str]) -> dict | None:
+    """Post the {"/path": sha1} map and return the new deploy."""
+    url = f"{NETLIFY_API_URL}/sites/{NETLIFY_SITE_ID}/deploys"
+    response = http_client.request(session, "POST", url, json={"files": digests}, timeout=120)
+    if response.status_code not in [200, 201]:
+        print(f"❌ Failed to create deploy: {response.status_code} - {response.text}")
+        return None
+    return response.json()
 
 
-def run_command(cmd: list[str], cwd: str = None, timeout: int = TIMEOUT) -> tuple[bool, str]:
-    """Run a command and return success status and output."""
+def upload_file(session, deploy_id: str, filepath: Path, remote_path: str) -> bool:
+    """Upload one required file to a deploy."""
+    url = f"{NETLIFY_API_URL}/deploys/{deploy_id}/files{quote(remote_path)}"
+
+    def send():
+        with open(filepath, "rb") as f:
+            return session.put(url, data=f, headers={"Content-Type": "application/octet-stream"},
+                               timeout=deadline.clamp(300))
+
     try:
-        result = subprocess.run(
-            cmd,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            shell=True if sys.platform == "win32" else False
-        )
-        output = result.stdout + result.stderr
-        return result.returncode == 0, output
-    except subprocess.TimeoutExpired:
-        return False, f"Command timed out after {timeout}s"
+        response = http_client.with_retries(send)
+        if response.status_code in [200, 201]:
+            return True
+        print(f"Failed to upload {remote_path}: {response.status_code} - {response.text}")
     except Exception as e:
-        return False, str(e)
+        print(f"Failed to upload {remote_path}: {e}")
+    return False
+
+
+def wait_for_deploy(session, deploy_id: str, timeout: int = TIMEOUT) -> dict | None:
+    """Poll a deploy until Netlify reports it ready."""
+    url = f"{NETLIFY_API_URL}/deploys/{deploy_id}"
+    give_up = time.time() + timeout
+
+    while time.time() < give_up:
+        response = http_client.request(session, "GET", url, timeout=30)
+        if response.status_code == 200:
+            deploy = response.json()
+            if deploy.get("state") == "ready":
+                return deploy
+            if deploy.get("state") == "error":
+                print(f"❌ Deploy failed: {deploy.get('error_message')}")
+                return None
+        time.sleep(POLL_INTERVAL)
+
+    print(f"❌ Deploy not ready after {timeout}s")
+    return None
+
+
+def deploy_with_api(dist_path: Path) -> bool:
+    """Deploy through the Netlify API, uploading only files Netlify lacks."""
+    with timed_phase(PROVIDER, "hash") as counters:
+        files, sources = site_headers.deploy_files(dist_path, "netlify")
+        digests = {f"/{path}": info["sha1"] for path, info in files.items()}
+        counters["files"] = len(files)
+
+    session = create_session()
+    with timed_phase(PROVIDER, "create"):
+        deploy = create_deploy(session, digests)
+        if not deploy:
+            return False
+
+    # Netlify lists the sha1s it has never seen; each needs one upload
+    required = set(deploy.get("required", []))
+    uploads = {}
+    for path, info in files.items():
+        if info["sha1"] in required and info["sha1"] not in uploads:
+            uploads[info["sha1"]] = path
+
+    uploaded_bytes = sum(files[path]["size"] for path in uploads.values())
+    print(f"📁 {len(files)} files, {len(uploads)} to upload "
+          f"({uploaded_bytes / 1024 / 1024:.1f} MB), {len(files) - len(uploads)} already on Netlify")
+
+    print_lock = threading.Lock()
+
+    def run(path: str) -> bool:
+        ok = upload_file(session, deploy["id"], sources[path], f"/{path}")
+        with print_lock:
+            print(f"  {'✅' if ok else '❌'} {path}")
+        return ok
+
+    with timed_phase(PROVIDER, "upload") as counters:
+        counters.update(bytes=uploaded_bytes, files=len(uploads), skipped=len(files) - len(uploads))
+        with ThreadPoolExecutor(max_workers=max(1, UPLOAD_WORKERS)) as pool:
+            results = list(pool.map(deadline.bind(run), sorted(uploads.values())))
+
+    if not all(results):
+        print(f"❌ Uploaded {sum(results)}/{len(results)} files")
+        return False
+
+    with timed_phase(PROVIDER, "finalize"):
+        deploy = wait_for_deploy(session, deploy["id"])
+        if not deploy:
+            return False
+
+    print("✅ Deployment successful!")
+    url = deploy.get("ssl_url") or deploy.get("url")
+    if url:
+        print(f"🌐 URL: {url}")
+    return True
 
 
-def build_project() -> bool:
-    """Build the project."""
-    print("📦 Building project...")
+def deploy_with_cli(dist_path: Path) -> bool:
+    """Deploy using the Netlify CLI."""
     project_root = Path(__file__).parent.parent
-    success, output = run_command(["npm", "run", "build"], cwd=str(project_root))
+
+    # Deploy using Netlify CLI
+    with site_headers.staged_dist(dist_path, "netlify") as stage_path, timed_phase(PROVIDER, "upload"):
+        cmd = [
+            "npx", "netlify-cli", "deploy",
+            "--dir", str(stage_path),
+            "--prod",
+            "--auth", NETLIFY_AUTH_TOKEN or "",
+            "--site", NETLIFY_SITE_ID or ""
+        ]
+        success, output = run_command(cmd, cwd=str(project_root), timeout=TIMEOUT)
+
     if success:
-        print("✅ Build successful")
+        print("✅ Deployment successful!")
+        if "https://" in output:
+            for line in output.split("\n"):
+                if "https://" in line:
+                    print(f"🌐 URL: {line.strip()}")
     else:
-        print(f"❌ Build failed: {output}")
+        print(f"❌ Deployment failed: {output}")
+
     return success
 
 
-def deploy_to_netlify() -> bool:
+def deploy_to_netlify(dist_path: Path | None = None) -> bool:
     """Deploy to Netlify."""
     print("🚀 Deploying to Netlify...")
 
     project_root = Path(__file__).parent.parent
-    dist_path = project_root / DIST_DIR
+    dist_path = dist_path or project_root / DIST_DIR
 
     if not dist_path.exists():
         print(f"❌ Dist directory not found: {dist_path}")
         return False
 
-    env = os.environ.copy()
-    env["NETLIFY_AUTH_TOKEN"] = NETLIFY_AUTH_TOKEN or ""
-    env["NETLIFY_SITE_ID"] = NETLIFY_SITE_ID or ""
+    if NETLIFY_USE_CLI:
+        return deploy_with_cli(dist_path)
+    return deploy_with_api(dist_path)
 
-    # Deploy using Netlify CLI
-    cmd = [
-        "npx", "netlify-cli", "deploy",
-        "--dir", str(dist_path),
-        "--prod",
-        "--auth", NETLIFY_AUTH_TOKEN or "",
-        "--site", NETLIFY_SITE_ID or ""
-    ]
 
-    success, output = run_command(cmd, cwd=str(project_root))
+def check_config() -> bool:
+    """Report missing credentials; return True when the provider can deploy."""
+    if not NETLIFY_AUTH_TOKEN:
+        print("❌ Missing NETLIFY_AUTH_TOKEN")
+        return False
 
-    if success:
-        print("✅ Deployment successful!")
-        if "https://" in output:
-            for line in output.split("\n"):
-                if "https://" in line:
-                    print(f"🌐 URL: {line.strip()}")
-    else:
-        print(f"❌ Deployment failed: {output}")
+    if not NETLIFY_SITE_ID:
+        print("❌ Missing NETLIFY_SITE_ID")
+        return False
+    return True
 
-    return success
+
+def deploy(dist_path: Path, deadline_at: float | None = None) -> bool:
+    """Provider entry point: deploy a prebuilt dist (used by deploy_all.py).
+
+    Nothing is started after deadline_at (epoch seconds), including by upload workers.
+    """
+    with deadline.scope(deadline_at):
+        return check_config() and deploy_to_netlify(dist_path)
 
 
 def main():
@@ -95,14 +215,14 @@ def main():
     print("🔷 Netlify Deployment")
     print("=" * 60)
 
-    if not NETLIFY_AUTH_TOKEN:
-        print("❌ Missing NETLIFY_AUTH_TOKEN")
+    if not check_config():
         return False
 
-    if not build_project():
+    dist_path = resolve_dist(build_project)
+    if not dist_path:
         return False
 
-    if not deploy_to_netlify():
+    if not deploy_to_netlify(dist_path):
         return False
 
     print("\n" + "=" * 60)
@@ -112,5 +232,6 @@ def main():
 
 
 if __name__ == "__main__":
+    profiling.init()
     success = main()
     sys.exit(0 if success else 1)
@@ -4,62 +4,33 @@ Deploys Pixel OS to Surge.sh
 """
 
 import os
-import subprocess
 import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
+import deadline
+import profiling
+from build_artifact import build_project, resolve_dist
+from deploy_history import timed_phase
+from process_runner import run_command
+
 # Load environment variables
 load_dotenv()
 
 # Configuration
 SURGE_TOKEN = os.getenv("SURGE_TOKEN")
 SURGE_DOMAIN = os.getenv("SURGE_DOMAIN", "pixel-os.surge.sh")
+PROVIDER = "Surge"
 DIST_DIR = "dist"
 TIMEOUT = 300
 
 
-def run_command(cmd: list[str], cwd: str = None, timeout: int = TIMEOUT, env: dict = None) -> tuple[bool, str]:
-    """Run a command and return success status and output."""
-    try:
-        run_env = os.environ.copy()
-        if env:
-            run_env.update(env)
-        result = subprocess.run(
-            cmd,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            shell=True if sys.platform == "win32" else False,
-            env=run_env
-        )
-        output = result.stdout + result.stderr
-        return result.returncode == 0, output
-    except subprocess.TimeoutExpired:
-        return False, f"Command timed out after {timeout}s"
-    except Exception as e:
-        return False, str(e)
-
-
-def build_project() -> bool:
-    """Build the project."""
-    print("📦 Building project...")
-    project_root = Path(__file__).parent.parent
-    success, output = run_command(["npm", "run", "build"], cwd=str(project_root))
-    if success:
-        print("✅ Build successful")
-    else:
-        print(f"❌ Build failed: {output}")
-    return success
-
-
-def deploy_to_surge() -> bool:
+def deploy_to_surge(dist_path: Path | None = None) -> bool:
     """Deploy to Surge."""
     print("🚀 Deploying to Surge...")
 
     project_root = Path(__file__).parent.parent
-    dist_path = project_root / DIST_DIR
+    dist_path = dist_path or project_root / DIST_DIR
 
     if not dist_path.exists():
         print(f"❌ Dist directory not found: {dist_path}")
@@ -69,7 +40,8 @@ def deploy_to_surge() -> bool:
     cmd = ["npx", "surge", str(dist_path), SURGE_DOMAIN]
     env = {"SURGE_TOKEN": SURGE_TOKEN or ""}
 
-    success, output = run_command(cmd, cwd=str(project_root), env=env)
+    with timed_phase(PROVIDER, "upload"):
+        success, output = run_command(cmd, cwd=str(project_root), timeout=TIMEOUT, env=env)
 
     if success:
         print("✅ Deployment successful!")
@@ -80,20 +52,37 @@ def deploy_to_surge() -> bool:
     return success
 
 
+def check_config() -> bool:
+    """Report missing credentials; return True when the provider can deploy."""
+    if not SURGE_TOKEN:
+        print("❌ Missing SURGE_TOKEN")
+        return False
+    return True
+
+
+def deploy(dist_path: Path, deadline_at: float | None = None) -> bool:
+    """Provider entry point: deploy a prebuilt dist (used by deploy_all.py).
+
+    Nothing is started after deadline_at (epoch seconds), including by upload workers.
+    """
+    with deadline.scope(deadline_at):
+        return check_config() and deploy_to_surge(dist_path)
+
+
 def main():
     """Main deployment function."""
     print("=" * 60)
     print("🔷 Surge Deployment")
     print("=" * 60)
 
-    if not SURGE_TOKEN:
-        print("❌ Missing SURGE_TOKEN")
+    if not check_config():
         return False
 
-    if not build_project():
+    dist_path = resolve_dist(build_project)
+    if not dist_path:
         return False
 
-    if not deploy_to_surge():
+    if not deploy_to_surge(dist_path):
         return False
 
     print("\n" + "=" * 60)
@@ -104,5 +93,6 @@ def main():
 
 
 if __name__ == "__main__":
+    profiling.init()
     success = main()
     sys.exit(0 if success else 1)
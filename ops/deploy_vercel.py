@@ -4,11 +4,21 @@ Deploys Pixel OS to Vercel
 """
 
 import os
-import subprocess
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 
+import deadline
+import http_client
+import site_headers
+import profiling
+from build_artifact import build_project, resolve_dist
+from deploy_history import timed_phase
+from process_runner import run_command
+
 # Load environment variables
 load_dotenv()
 
@@ -16,65 +26,186 @@ load_dotenv()
 VERCEL_TOKEN = os.getenv("VERCEL_TOKEN")
 VERCEL_ORG_ID = os.getenv("VERCEL_ORG_ID")
 VERCEL_PROJECT_ID = os.getenv("VERCEL_PROJECT_ID")
+VERCEL_PROJECT_NAME = os.getenv("VERCEL_PROJECT_NAME", "pixel-os")
+PROVIDER = "Vercel"
+VERCEL_API_URL = os.getenv("VERCEL_API_URL", "https://api.vercel.com")
+VERCEL_USE_CLI = os.getenv("VERCEL_USE_CLI", "False").lower() == "true"
+UPLOAD_WORKERS = int(os.getenv("VERCEL_UPLOAD_WORKERS", "8"))
 DIST_DIR = "dist"
 TIMEOUT = 300
+POLL_INTERVAL = 2
+
+
+def get_params() -> dict:
+    """Scope API calls to the team when the org is a team."""
+    if VERCEL_ORG_ID and VERCEL_ORG_ID.startswith("team_"):
+        return {"teamId": VERCEL_ORG_ID}
+    return {}
+
+
+def create_deployment(session, files: dict[str, dict]) -> tuple[dict | None, list[str]]:
+    """Create a prebuilt production deployment.
+
+    Returns (deployment, []) on success or (None, missing sha1s) when Vercel
+    still needs some files uploaded first.
+    """
+    payload = {
+        "name": VERCEL_PROJECT_NAME,
+        "target": "production",
+        "files": [
+            {"file": path, "sha": info["sha1"], "size": info["size"]}
+            for path, info in files.items()
+        ],
+        # Serve the files as-is; no remote install or build
+        "projectSettings": {
+            "framework": None,
+            "buildCommand": None,
+            "installCommand": None,
+            "outputDirectory": None,
+        },
+    }
+    if VERCEL_PROJECT_ID:
+        payload["project"] = VERCEL_PROJECT_ID
+
+    response = http_client.request(
+        session, "POST", f"{VERCEL_API_URL}/v13/deployments",
+        params=get_params(), json=payload, timeout=120
+    )
+    if response.status_code in [200, 201]:
+        return response.json(), []
 
+    try:
+        error = response.json().get("error", {})
+    except ValueError:
+        error = {}
+    if error.get("code") == "missing_files":
+        return None, error.get("missing", [])
+
+    print(f"❌ Failed to create deployment: {response.status_code} - {response.text}")
+    return None, []
+
+
+def upload_file(session, filepath: Path, sha1: str, size: int) -> bool:
+    """Upload one file keyed by its sha1 digest."""
+    headers = {
+        "Content-Type": "application/octet-stream",
+        "Content-Length": str(size),
+        "x-vercel-digest": sha1,
+    }
+
+    def send():
+        with open(filepath, "rb") as f:
+            return session.post(
+                f"{VERCEL_API_URL}/v2/files", params=get_params(),
+                headers=headers, data=f, timeout=deadline.clamp(300)
+            )
 
-def run_command(cmd: list[str], cwd: str = None, timeout: int = TIMEOUT) -> tuple[bool, str]:
-    """Run a command and return success status and output."""
     try:
-        result = subprocess.run(
-            cmd,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-            shell=True if sys.platform == "win32" else False
-        )
-        output = result.stdout + result.stderr
-        return result.returncode == 0, output
-    except subprocess.TimeoutExpired:
-        return False, f"Command timed out after {timeout}s"
+        response = http_client.with_retries(send)
+        if response.status_code == 200:
+            return True
+        print(f"Failed to upload {filepath.name}: {response.status_code} - {response.text}")
     except Exception as e:
-        return False, str(e)
+        print(f"Failed to upload {filepath.name}: {e}")
+    return False
 
 
-def build_project() -> bool:
-    """Build the project."""
-    print("📦 Building project...")
-    project_root = Path(__file__).parent.parent
-    success, output = run_command(["npm", "run", "build"], cwd=str(project_root))
-    if success:
-        print("✅ Build successful")
-    else:
-        print(f"❌ Build failed: {output}")
-    return success
+def wait_for_deployment(session, deployment_id: str, timeout: int = TIMEOUT) -> dict | None:
+    """Poll a deployment until it is READY."""
+    url = f"{VERCEL_API_URL}/v13/deployments/{deployment_id}"
+    give_up = time.time() + timeout
 
+    while time.time() < give_up:
+        response = http_client.request(session, "GET", url, params=get_params(), timeout=30)
+        if response.status_code == 200:
+            deployment = response.json()
+            if deployment.get("readyState") == "READY":
+                return deployment
+            if deployment.get("readyState") in ["ERROR", "CANCELED"]:
+                print(f"❌ Deployment {deployment['readyState'].lower()}")
+                return None
+        time.sleep(POLL_INTERVAL)
 
-def deploy_to_vercel() -> bool:
-    """Deploy to Vercel."""
-    print("🚀 Deploying to Vercel...")
+    print(f"❌ Deployment not ready after {timeout}s")
+    return None
 
-    project_root = Path(__file__).parent.parent
-    dist_path = project_root / DIST_DIR
 
-    if not dist_path.exists():
-        print(f"❌ Dist directory not found: {dist_path}")
+def deploy_with_api(dist_path: Path) -> bool:
+    """Deploy the prebuilt dist, uploading only files Vercel lacks."""
+    with timed_phase(PROVIDER, "hash") as counters:
+        files, sources = site_headers.deploy_files(dist_path, "vercel")
+        counters["files"] = len(files)
+    session = http_client.create_session(
+        pool_size=UPLOAD_WORKERS,
+        headers={"Authorization": f"Bearer {VERCEL_TOKEN}"}
+    )
+
+    with timed_phase(PROVIDER, "create"):
+        deployment, missing = create_deployment(session, files)
+
+    if not deployment and missing:
+        # Each missing digest needs exactly one upload
+        uploads = {}
+        for path, info in files.items():
+            if info["sha1"] in missing and info["sha1"] not in uploads:
+                uploads[info["sha1"]] = path
+
+        uploaded_bytes = sum(files[path]["size"] for path in uploads.values())
+        print(f"📁 {len(files)} files, {len(uploads)} to upload "
+              f"({uploaded_bytes / 1024 / 1024:.1f} MB), {len(files) - len(uploads)} already on Vercel")
+
+        print_lock = threading.Lock()
+
+        def run(path: str) -> bool:
+            info = files[path]
+            ok = upload_file(session, sources[path], info["sha1"], info["size"])
+            with print_lock:
+                print(f"  {'✅' if ok else '❌'} {path}")
+            return ok
+
+        with timed_phase(PROVIDER, "upload") as counters:
+            counters.update(bytes=uploaded_bytes, files=len(uploads), skipped=len(files) - len(uploads))
+            with ThreadPoolExecutor(max_workers=max(1, UPLOAD_WORKERS)) as pool:
+                results = list(pool.map(deadline.bind(run), sorted(uploads.values())))
+        if not all(results):
+            print(f"❌ Uploaded {sum(results)}/{len(results)} files")
+            return False
+
+        with timed_phase(PROVIDER, "create"):
+            deployment, missing = create_deployment(session, files)
+    elif deployment:
+        print(f"📁 {len(files)} files, all already on Vercel")
+
+    if not deployment:
+        if missing:
+            print(f"❌ Vercel still reports {len(missing)} missing files")
         return False
 
-    env = os.environ.copy()
-    env["VERCEL_TOKEN"] = VERCEL_TOKEN or ""
-    env["VERCEL_ORG_ID"] = VERCEL_ORG_ID or ""
-    env["VERCEL_PROJECT_ID"] = VERCEL_PROJECT_ID or ""
+    with timed_phase(PROVIDER, "finalize"):
+        deployment = wait_for_deployment(session, deployment["id"])
+        if not deployment:
+            return False
+
+    print("✅ Deployment successful!")
+    print(f"🌐 URL: https://{deployment['url']}")
+    return True
 
-    # Deploy using Vercel CLI
-    cmd = [
-        "npx", "vercel", "--prod",
-        "--token", VERCEL_TOKEN or "",
-        "--yes"
-    ]
 
-    success, output = run_command(cmd, cwd=str(project_root), timeout=TIMEOUT)
+def deploy_with_cli(dist_path: Path) -> bool:
+    """Deploy the prebuilt dist using the Vercel CLI."""
+    env = {
+        "VERCEL_ORG_ID": VERCEL_ORG_ID or "",
+        "VERCEL_PROJECT_ID": VERCEL_PROJECT_ID or "",
+    }
+
+    # Deploy the built output, not the source tree, so Vercel doesn't rebuild
+    with site_headers.staged_dist(dist_path, "vercel") as stage_path, timed_phase(PROVIDER, "upload"):
+        cmd = [
+            "npx", "vercel", "deploy", str(stage_path), "--prod",
+            "--token", VERCEL_TOKEN or "",
+            "--yes"
+        ]
+        success, output = run_command(cmd, cwd=str(stage_path), timeout=TIMEOUT, env=env)
 
     if success:
         print("✅ Deployment successful!")
@@ -88,20 +219,53 @@ def deploy_to_vercel() -> bool:
     return success
 
 
+def deploy_to_vercel(dist_path: Path | None = None) -> bool:
+    """Deploy to Vercel."""
+    print("🚀 Deploying to Vercel...")
+
+    project_root = Path(__file__).parent.parent
+    dist_path = dist_path or project_root / DIST_DIR
+
+    if not dist_path.exists():
+        print(f"❌ Dist directory not found: {dist_path}")
+        return False
+
+    if VERCEL_USE_CLI:
+        return deploy_with_cli(dist_path)
+    return deploy_with_api(dist_path)
+
+
+def check_config() -> bool:
+    """Report missing credentials; return True when the provider can deploy."""
+    if not VERCEL_TOKEN:
+        print("❌ Missing VERCEL_TOKEN")
+        return False
+    return True
+
+
+def deploy(dist_path: Path, deadline_at: float | None = None) -> bool:
+    """Provider entry point: deploy a prebuilt dist (used by deploy_all.py).
+
+    Nothing is started after deadline_at (epoch seconds), including by upload workers.
+    """
+    with deadline.scope(deadline_at):
+        return check_config() and deploy_to_vercel(dist_path)
+
+
 def main():
     """Main deployment function."""
     print("=" * 60)
     print("🔷 Vercel Deployment")
     print("=" * 60)
 
-    if not VERCEL_TOKEN:
-        print("❌ Missing VERCEL_TOKEN")
+    if not check_config():
         return False
 
-    if not build_project():
+    dist_path = resolve_dist(build_project)
+    if not dist_path:
         return False
 
-    if not deploy_to_vercel():
+    if not deploy_to_vercel(dist_path):
         return False
 
     print("\n" + "=" * 60)
@@ -111,5 +275,6 @@ def main():
 
 
 if __name__ == "__main__":
+    profiling.init()
     success = main()
     sys.exit(0 if success else 1)
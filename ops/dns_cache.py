@@ -0,0 +1,64 @@
+"""
+DNS State Cache
+Remembers zone IDs, record listings and nameservers between runs of the
+DNS scripts, so steady-state runs need one validation request or none.
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Configuration
+CACHE_DIR = Path(os.getenv("OPS_CACHE_DIR", Path(__file__).parent / ".cache"))
+CACHE_PATH = CACHE_DIR / "dns_cache.json"
+CACHE_ENABLED = os.getenv("OPS_DNS_CACHE", "True").lower() == "true"
+DEFAULT_TTL = int(os.getenv("OPS_DNS_CACHE_TTL", "3600"))  # seconds
+
+_entries = None
+_lock = threading.Lock()
+
+
+def _load() -> dict:
+    global _entries
+    if _entries is None:
+        try:
+            _entries = json.loads(CACHE_PATH.read_text())
+        except (OSError, ValueError):
+            _entries = {}
+    return _entries
+
+
+def get(section: str, key: str):
+    """Return a cached value, or None if missing, expired or caching is off."""
+    if not CACHE_ENABLED:
+        return None
+    with _lock:
+        entry = _load().get(section, {}).get(key)
+    if not entry or entry["expires"] < time.time():
+        return None
+    return entry["value"]
+
+
+def put(section: str, key: str, value, ttl: int = DEFAULT_TTL):
+    """Store a value for ttl seconds and persist the cache."""
+    if not CACHE_ENABLED:
+        return
+    with _lock:
+        _load().setdefault(section, {})[key] = {"value": value, "expires": time.time() + ttl}
+        _save()
+
+
+def invalidate(section: str, key: str):
+    """Drop a cached value, e.g. after the API contradicted it."""
+    with _lock:
+        if _load().get(section, {}).pop(key, None) is not None:
+            _save()
+
+
+def _save():
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(_entries, indent=2))
+    os.replace(tmp, CACHE_PATH)
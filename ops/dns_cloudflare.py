@@ -3,10 +3,15 @@ Cloudflare DNS Management Script
 Manages DNS records for pixel-os domains
 """
 
+import hashlib
+import json
 import os
-import requests
 from dotenv import load_dotenv
 
+import dns_cache
+import events
+import http_client
+
 # Load environment variables
 load_dotenv()
 
@@ -16,6 +21,7 @@ CLOUDFLARE_EMAIL = os.getenv("CLOUDFLARE_EMAIL")
 CLOUDFLARE_ACCOUNT_ID = os.getenv("CLOUDFLARE_ACCOUNT_ID")
 
 # DNS Configuration
+# Set "prune": True on a zone to delete records that are not listed here
 DNS_RECORDS = [
     {
         "zone_name": "oriz.in",
@@ -25,7 +31,14 @@ DNS_RECORDS = [
     }
 ]
 
-API_BASE = "https://api.cloudflare.com/client/v4"
+API_BASE = os.getenv("CLOUDFLARE_API_URL", "https://api.cloudflare.com/client/v4")
+DNS_VERIFY = os.getenv("DNS_VERIFY", "False").lower() == "true"
+# Within the cache TTL an unchanged config is checked with one listing
+# request against the cached records; set this to skip even that request
+DNS_TRUST_CACHE = os.getenv("DNS_TRUST_CACHE", "False").lower() == "true"
+PAGE_SIZE = 5000
+BATCH_SIZE = 200
+ZONE_ID_TTL = 7 * 24 * 3600  # zone IDs only change if a zone is re-added
 
 
 def get_headers():
@@ -37,61 +50,186 @@ def get_headers():
     }
 
 
-def get_zone_id(zone_name: str) -> str | None:
-    """Get zone ID by name."""
-    url = f"{API_BASE}/zones?name={zone_name}"
-    response = requests.get(url, headers=get_headers())
+def get_zone_id(session, zone_name: str, use_cache: bool = True) -> str | None:
+    """Get zone ID by name, from the cache when possible."""
+    if use_cache:
+        zone_id = dns_cache.get("zones", zone_name)
+        if zone_id:
+            return zone_id
+
+    url = f"{API_BASE}/zones"
+    response = http_client.request(session, "GET", url, params={"name": zone_name}, timeout=30)
 
     if response.status_code == 200:
         data = response.json()
         if data["result"]:
-            return data["result"][0]["id"]
+            zone_id = data["result"][0]["id"]
+            dns_cache.put("zones", zone_name, zone_id, ttl=ZONE_ID_TTL)
+            return zone_id
     return None
 
 
-def get_existing_record(zone_id: str, record_type: str, record_name: str) -> dict | None:
-    """Get existing DNS record."""
-    url = f"{API_BASE}/zones/{zone_id}/dns_records?type={record_type}&name={record_name}"
-    response = requests.get(url, headers=get_headers())
+def list_records(session, zone_id: str) -> list[dict] | None:
+    """List every DNS record in a zone, following pagination."""
+    url = f"{API_BASE}/zones/{zone_id}/dns_records"
+    records = []
+    page = 1
 
-    if response.status_code == 200:
+    while True:
+        response = http_client.request(
+            session, "GET", url, params={"per_page": PAGE_SIZE, "page": page}, timeout=30
+        )
+        if response.status_code != 200:
+            print(f"  ❌ Failed to list records: {response.text}")
+            return None
         data = response.json()
-        if data["result"]:
-            return data["result"][0]
-    return None
+        records.extend(data["result"])
+
+        total_pages = data.get("result_info", {}).get("total_pages", 1)
+        if page >= total_pages:
+            return records
+        page += 1
 
 
-def create_or_update_record(zone_id: str, record: dict, zone_name: str) -> bool:
-    """Create or update a DNS record."""
-    full_name = f"{record['name']}.{zone_name}" if record['name'] != '@' else zone_name
+def full_name(name: str, zone_name: str) -> str:
+    """Expand a record name relative to its zone."""
+    if name == "@" or name == zone_name:
+        return zone_name
+    if name.endswith(f".{zone_name}"):
+        return name
+    return f"{name}.{zone_name}"
 
-    existing = get_existing_record(zone_id, record["type"], full_name)
 
-    payload = {
+def record_payload(record: dict, zone_name: str) -> dict:
+    """Build the API payload for a configured record."""
+    return {
         "type": record["type"],
-        "name": record["name"],
+        "name": full_name(record["name"], zone_name),
         "content": record["content"],
         "proxied": record.get("proxied", False),
         "ttl": record.get("ttl", 1)  # 1 = auto
     }
 
-    if existing:
-        # Update
-        url = f"{API_BASE}/zones/{zone_id}/dns_records/{existing['id']}"
-        response = requests.put(url, headers=get_headers(), json=payload)
-        action = "Updated"
-    else:
-        # Create
-        url = f"{API_BASE}/zones/{zone_id}/dns_records"
-        response = requests.post(url, headers=get_headers(), json=payload)
-        action = "Created"
-
-    if response.status_code in [200, 201]:
-        print(f"  ✅ {action}: {record['type']} {record['name']} -> {record['content']}")
-        return True
-    else:
-        print(f"  ❌ Failed: {response.json()}")
-        return False
+
+def record_key(record: dict) -> tuple[str, str]:
+    """Return the (type, name) a record set is addressed by."""
+    return record["type"], record["name"].lower()
+
+
+def plan_changes(zone_config: dict, actual: list[dict]) -> dict[str, list[dict]]:
+    """Diff desired records against the zone listing.
+
+    Returns {"posts", "patches", "deletes"} lists ready for the batch API;
+    records that already match are left out entirely. A name can hold
+    several records of one type (TXT, A, MX), so desired records are first
+    matched to existing ones by content, each existing record at most once;
+    only the rest are patched onto leftover records at the same name, or
+    created. With "prune", every existing record left unmatched is deleted.
+    """
+    zone_name = zone_config["zone_name"]
+    unmatched = {}
+    for existing in actual:
+        unmatched.setdefault(record_key(existing), []).append(existing)
+
+    changes = {"posts": [], "patches": [], "deletes": []}
+    pending = []
+
+    for record in zone_config["records"]:
+        payload = record_payload(record, zone_name)
+        candidates = unmatched.get(record_key(payload), [])
+        current = next((m for m in candidates if m["content"] == payload["content"]), None)
+        if current is None:
+            pending.append(payload)
+            continue
+        candidates.remove(current)
+        if (current.get("proxied", False), current.get("ttl", 1)) != (payload["proxied"], payload["ttl"]):
+            changes["patches"].append({"id": current["id"], **payload})
+
+    for payload in pending:
+        candidates = unmatched.get(record_key(payload), [])
+        if candidates:
+            changes["patches"].append({"id": candidates.pop(0)["id"], **payload})
+        else:
+            changes["posts"].append(payload)
+
+    if zone_config.get("prune"):
+        for candidates in unmatched.values():
+            changes["deletes"].extend({"id": m["id"]} for m in candidates)
+
+    return changes
+
+
+def apply_changes(session, zone_id: str, changes: dict[str, list[dict]]) -> dict[str, list[dict]] | None:
+    """Apply planned changes through the batch endpoint, BATCH_SIZE at a time.
+
+    Returns the records the API reports back per operation kind, or None on failure.
+    """
+    url = f"{API_BASE}/zones/{zone_id}/dns_records/batch"
+    operations = [(kind, item) for kind in ["deletes", "patches", "posts"] for item in changes[kind]]
+    applied = {"deletes": [], "patches": [], "posts": []}
+
+    for start in range(0, len(operations), BATCH_SIZE):
+        batch = {"deletes": [], "patches": [], "posts": []}
+        for kind, item in operations[start:start + BATCH_SIZE]:
+            batch[kind].append(item)
+
+        response = http_client.request(session, "POST", url, json=batch, timeout=60)
+        if response.status_code != 200:
+            print(f"  ❌ Failed: {response.text}")
+            return None
+
+        result = response.json().get("result") or {}
+        for kind in applied:
+            applied[kind].extend(result.get(kind) or [])
+
+    return applied
+
+
+def merge_applied(actual: list[dict], applied: dict[str, list[dict]]) -> list[dict]:
+    """Return the zone listing as it looks after the applied changes."""
+    removed = {r["id"] for r in applied["deletes"]}
+    updated = {r["id"]: r for r in applied["patches"]}
+    records = [updated.get(r["id"], r) for r in actual if r["id"] not in removed]
+    return records + applied["posts"]
+
+
+def record_snapshot(records: list[dict]) -> list[tuple]:
+    """Reduce a zone listing to what a change outside this script would alter."""
+    return sorted(
+        (r["id"], r["type"], r["name"].lower(), r["content"], r.get("proxied", False), r.get("ttl", 1))
+        for r in records
+    )
+
+
+def config_digest(zone_config: dict) -> str:
+    """Fingerprint a zone's desired records so config edits bypass the cache."""
+    return hashlib.sha256(json.dumps(zone_config, sort_keys=True).encode()).hexdigest()
+
+
+def get_zone_records(session, zone_name: str) -> tuple[str | None, list[dict] | None]:
+    """Resolve the zone and list its records, retrying once if a cached zone ID went stale."""
+    zone_id = get_zone_id(session, zone_name)
+    if not zone_id:
+        return None, None
+
+    actual = list_records(session, zone_id)
+    if actual is None:
+        # The cached ID may point at a deleted/re-added zone
+        dns_cache.invalidate("zones", zone_name)
+        zone_id = get_zone_id(session, zone_name, use_cache=False)
+        if not zone_id:
+            return None, None
+        actual = list_records(session, zone_id)
+
+    return zone_id, actual
+
+
+def describe(kind: str, item: dict) -> str:
+    """Format a planned change for the log."""
+    if kind == "deletes":
+        return f"Deleted: {item['id']}"
+    action = "Created" if kind == "posts" else "Updated"
+    return f"{action}: {item['type']} {item['name']} -> {item['content']}"
 
 
 def main():
@@ -104,28 +242,92 @@ def main():
         print("❌ Missing Cloudflare credentials")
         return False
 
+    session = http_client.create_session(headers=get_headers())
     success_count = 0
     total_count = 0
+    zones = []
 
     for zone_config in DNS_RECORDS:
         zone_name = zone_config["zone_name"]
         print(f"\n📍 Zone: {zone_name}")
+        total_count += len(zone_config["records"])
 
-        zone_id = get_zone_id(zone_name)
-        if not zone_id:
-            print(f"  ❌ Zone not found: {zone_name}")
-            continue
+        with events.phase("zone", zone=zone_name) as outcome:
+            outcome.update(zone=zone_name, ok=False, status="failed", records=len(zone_config["records"]))
+            zones.append(outcome)
+
+            # Steady state: same config as the last successful run, within the TTL
+            digest = config_digest(zone_config)
+            state = dns_cache.get("records", zone_name)
+            actual = None
+            if state and state["config"] == digest:
+                if DNS_TRUST_CACHE:
+                    print("  📋 Up to date (cached)")
+                    success_count += len(zone_config["records"])
+                    outcome.update(ok=True, status="cached")
+                    continue
+
+                # One listing shows whether anything changed outside this script
+                zone_id = state["zone_id"]
+                actual = list_records(session, zone_id)
+                if actual is not None and record_snapshot(actual) == record_snapshot(state["records"]):
+                    print(f"  📋 Up to date ({len(actual)} records match the cache)")
+                    success_count += len(zone_config["records"])
+                    outcome.update(ok=True, status="verified")
+                    continue
+                print("  🔄 Zone differs from the cache, reconciling")
+                dns_cache.invalidate("records", zone_name)
+
+            if actual is None:
+                zone_id, actual = get_zone_records(session, zone_name)
+            if not zone_id:
+                print(f"  ❌ Zone not found: {zone_name}")
+                outcome["status"] = "not_found"
+                continue
+            if actual is None:
+                continue
+
+            changes = plan_changes(zone_config, actual)
+            pending = sum(len(items) for items in changes.values())
+            unchanged = len(zone_config["records"]) - len(changes["posts"]) - len(changes["patches"])
+            print(f"  📋 {len(actual)} existing records, {unchanged} up to date, {pending} changes")
+            outcome["changes"] = {kind: len(items) for kind, items in changes.items()}
+
+            applied = {"deletes": [], "patches": [], "posts": []}
+            if pending:
+                applied = apply_changes(session, zone_id, changes)
+                if applied is None:
+                    dns_cache.invalidate("records", zone_name)
+                    continue
+
+            dns_cache.put("records", zone_name, {
+                "zone_id": zone_id,
+                "config": digest,
+                "records": merge_applied(actual, applied),
+            })
+
+            for kind, items in changes.items():
+                for item in items:
+                    print(f"  ✅ {describe(kind, item)}")
+            success_count += len(zone_config["records"])
+            outcome.update(ok=True, status="applied" if pending else "unchanged")
 
-        for record in zone_config["records"]:
-            total_count += 1
-            if create_or_update_record(zone_id, record, zone_name):
-                success_count += 1
+    success = success_count == total_count
+    verified = None
+    if success and DNS_VERIFY:
+        import dns_verify
+        with events.phase("verify") as outcome:
+            success = verified = outcome["ok"] = dns_verify.verify(dns_verify.record_checks(DNS_RECORDS))
 
     print("\n" + "=" * 60)
     print(f"✅ DNS Records: {success_count}/{total_count} successful")
     print("=" * 60)
 
-    return success_count == total_count
+    events.summary(
+        success=success, records_ok=success_count, records_total=total_count, verified=verified,
+        zones=zones,
+    )
+    return success
 
 
 if __name__ == "__main__":
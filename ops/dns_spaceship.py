@@ -4,12 +4,18 @@ Manages nameserver configuration via Spaceship API
 """
 
 import os
-import requests
 import hashlib
 import hmac
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+import dns_cache
+import events
+import http_client
+
 # Load environment variables
 load_dotenv()
 
@@ -17,6 +23,16 @@ load_dotenv()
 SPACESHIP_API_KEY = os.getenv("SPACESHIP_API_KEY")
 SPACESHIP_API_SECRET = os.getenv("SPACESHIP_API_SECRET")
 SPACESHIP_API_URL = os.getenv("SPACESHIP_API_URL", "https://spaceship.dev/api/v1")
+SPACESHIP_WORKERS = int(os.getenv("SPACESHIP_WORKERS", "4"))
+DNS_VERIFY = os.getenv("DNS_VERIFY", "False").lower() == "true"
+# Nameservers are re-read from the registrar on every run; set this to trust
+# the ones a recent run confirmed and skip even that request
+DNS_TRUST_CACHE = os.getenv("DNS_TRUST_CACHE", "False").lower() == "true"
+
+# Domains to point at Cloudflare (override with SPACESHIP_DOMAINS or CLI args)
+DOMAINS = [
+    d.strip() for d in os.getenv("SPACESHIP_DOMAINS", "oriz.in").split(",") if d.strip()
+]
 
 # Cloudflare nameservers
 CLOUDFLARE_NS = [
@@ -42,39 +58,75 @@ def get_auth_headers():
     }
 
 
-def get_domain_info(domain: str) -> dict | None:
-    """Get domain information."""
+def get_domain_info(session, domain: str) -> tuple[dict | None, str | None]:
+    """Get domain information; returns (info, error)."""
     url = f"{SPACESHIP_API_URL}/domains/{domain}"
 
     try:
-        response = requests.get(url, headers=get_auth_headers(), timeout=30)
+        response = http_client.request(session, "GET", url, headers=get_auth_headers(), timeout=30)
         if response.status_code == 200:
-            return response.json()
+            return response.json(), None
+        return None, f"{response.status_code} - {response.text}"
     except Exception as e:
-        print(f"Error: {e}")
+        return None, str(e)
 
-    return None
 
-
-def update_nameservers(domain: str, nameservers: list) -> bool:
-    """Update domain nameservers."""
+def update_nameservers(session, domain: str, nameservers: list) -> tuple[bool, str | None]:
+    """Update domain nameservers; returns (success, error)."""
     url = f"{SPACESHIP_API_URL}/domains/{domain}/nameservers"
 
     payload = {"nameservers": nameservers}
 
     try:
-        response = requests.put(url, headers=get_auth_headers(), json=payload, timeout=30)
+        response = http_client.request(
+            session, "PUT", url, headers=get_auth_headers(), json=payload, timeout=30
+        )
         if response.status_code in [200, 201, 204]:
-            return True
-        else:
-            print(f"Error: {response.status_code} - {response.text}")
+            return True, None
+        return False, f"{response.status_code} - {response.text}"
     except Exception as e:
-        print(f"Error: {e}")
+        return False, str(e)
+
 
-    return False
+def sync_domain(session, domain: str) -> tuple[bool, list[str]]:
+    """Point one domain at the Cloudflare nameservers; returns (success, log lines)."""
+    log = []
 
+    cached_ns = dns_cache.get("nameservers", domain)
+    if DNS_TRUST_CACHE and cached_ns is not None and set(cached_ns) == set(CLOUDFLARE_NS):
+        log.append("✅ Nameservers already configured correctly! (cached)")
+        return True, log
 
-def main():
+    # Get current info
+    info, error = get_domain_info(session, domain)
+    if info:
+        current_ns = info.get("nameservers", [])
+        log.append(f"📋 Current Nameservers: {', '.join(current_ns)}")
+        if cached_ns is not None and set(cached_ns) != set(current_ns):
+            log.append("🔄 Nameservers changed at the registrar since the last run")
+        dns_cache.put("nameservers", domain, current_ns)
+
+        if set(current_ns) == set(CLOUDFLARE_NS):
+            log.append("✅ Nameservers already configured correctly!")
+            return True, log
+    else:
+        log.append(f"⚠️ Could not read domain info: {error}")
+        dns_cache.invalidate("nameservers", domain)
+
+    # Update nameservers
+    log.append("🔄 Updating nameservers...")
+    success, error = update_nameservers(session, domain, CLOUDFLARE_NS)
+    if success:
+        log.append("✅ Nameservers updated successfully!")
+        dns_cache.put("nameservers", domain, CLOUDFLARE_NS)
+        return True, log
+    else:
+        log.append(f"❌ Failed to update nameservers: {error}")
+        dns_cache.invalidate("nameservers", domain)
+        return False, log
+
+
+def main(domains: list[str] | None = None):
     """Main function to update nameservers."""
     print("=" * 60)
     print("🔷 Spaceship DNS Management")
@@ -84,31 +136,58 @@ def main():
         print("❌ Missing Spaceship API credentials")
         return False
 
-    domain = "oriz.in"
-    print(f"\n📍 Domain: {domain}")
+    domains = domains or DOMAINS
     print(f"🎯 Target Nameservers: {', '.join(CLOUDFLARE_NS)}")
 
-    # Get current info
-    info = get_domain_info(domain)
-    if info:
-        current_ns = info.get("nameservers", [])
-        print(f"📋 Current Nameservers: {', '.join(current_ns)}")
+    workers = max(1, min(SPACESHIP_WORKERS, len(domains)))
+    session = http_client.create_session(pool_size=workers)
+    print_lock = threading.Lock()
+
+    def run(domain: str) -> tuple[bool, float]:
+        start_time = time.time()
+        with events.phase("domain", domain=domain) as outcome:
+            success, log = sync_domain(session, domain)
+            outcome["ok"] = success
+            if not success:
+                outcome["error"] = log[-1]
+        duration = time.time() - start_time
+        # Print each domain's log as one block so concurrent output doesn't interleave
+        with print_lock:
+            print("\n".join([f"\n📍 Domain: {domain}"] + [f"  {line}" for line in log]))
+        return success, duration
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run, domains))
+
+    print("\n" + "=" * 60)
+    print("📊 NAMESERVER SUMMARY")
+    print("=" * 60)
+    for domain, (success, duration) in zip(domains, results):
+        icon = "✅" if success else "❌"
+        print(f"  {icon} {domain}: {'SUCCESS' if success else 'FAILED'} ({duration:.1f}s)")
 
-        if set(current_ns) == set(CLOUDFLARE_NS):
-            print("✅ Nameservers already configured correctly!")
-            return True
+    successful = sum(1 for success, _ in results if success)
+    print(f"\nTotal: {successful}/{len(domains)} domains configured")
+    print("=" * 60)
 
-    # Update nameservers
-    print("\n🔄 Updating nameservers...")
-    if update_nameservers(domain, CLOUDFLARE_NS):
-        print("✅ Nameservers updated successfully!")
-        return True
-    else:
-        print("❌ Failed to update nameservers")
-        return False
+    success = successful == len(domains)
+    verified = None
+    if success and DNS_VERIFY:
+        import dns_verify
+        with events.phase("verify") as outcome:
+            checks = dns_verify.nameserver_checks(domains, CLOUDFLARE_NS)
+            success = verified = outcome["ok"] = dns_verify.verify(checks)
+
+    events.summary(
+        success=success, nameservers=CLOUDFLARE_NS, verified=verified,
+        domains=[
+            {"domain": domain, "ok": ok, "duration": duration}
+            for domain, (ok, duration) in zip(domains, results)
+        ],
+    )
+    return success
 
 
 if __name__ == "__main__":
-    import sys
-    success = main()
+    success = main(sys.argv[1:] or None)
     sys.exit(0 if success else 1)
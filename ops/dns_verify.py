@@ -0,0 +1,344 @@
+"""
+DNS Propagation Verifier
+Polls a set of resolvers until they all serve the configured records and
+nameservers, and reports how long each one took.
+"""
+
+import asyncio
+import ipaddress
+import os
+import random
+import struct
+import sys
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+# Comma-separated host[:port] list; a local stub server works for offline runs
+RESOLVERS = [
+    r.strip() for r in os.getenv("DNS_VERIFY_RESOLVERS", "1.1.1.1,8.8.8.8,9.9.9.9").split(",") if r.strip()
+]
+DEADLINE = float(os.getenv("DNS_VERIFY_DEADLINE", "300"))  # seconds
+QUERY_TIMEOUT = 3.0
+INITIAL_DELAY = 2.0
+MAX_DELAY = 60.0
+
+RECORD_TYPES = {"A": 1, "NS": 2, "CNAME": 5, "MX": 15, "TXT": 16, "AAAA": 28}
+TYPE_NAMES = {v: k for k, v in RECORD_TYPES.items()}
+
+FLAG_TC = 0x0200
+FLAG_RD = 0x0100
+
+
+class DNSError(Exception):
+    """Raised for malformed or failed DNS responses."""
+
+
+def parse_resolver(resolver: str) -> tuple[str, int]:
+    """Split "host[:port]" (or "[v6]:port") into a (host, port) pair."""
+    if resolver.startswith("["):
+        host, _, port = resolver[1:].partition("]:")
+        return host.rstrip("]"), int(port or 53)
+    if resolver.count(":") == 1:
+        host, port = resolver.split(":")
+        return host, int(port)
+    return resolver, 53
+
+
+def normalize(name: str) -> str:
+    """Lowercase a domain name and drop the trailing dot."""
+    return name.lower().rstrip(".")
+
+
+def build_query(name: str, record_type: str, query_id: int) -> bytes:
+    """Encode a recursive query for one name and record type."""
+    header = struct.pack("!HHHHHH", query_id, FLAG_RD, 1, 0, 0, 0)
+    qname = b"".join(
+        bytes([len(label)]) + label.encode("idna") for label in normalize(name).split(".") if label
+    ) + b"\0"
+    return header + qname + struct.pack("!HH", RECORD_TYPES[record_type], 1)
+
+
+def read_name(data: bytes, offset: int) -> tuple[str, int]:
+    """Read a possibly compressed name; return (name, offset after it)."""
+    labels = []
+    end = None
+    jumps = 0
+
+    while True:
+        if offset >= len(data):
+            raise DNSError("name runs past end of message")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if jumps > 20:
+                raise DNSError("compression loop")
+            if offset + 2 > len(data):
+                raise DNSError("name pointer runs past end of message")
+            pointer = struct.unpack("!H", data[offset:offset + 2])[0] & 0x3FFF
+            if end is None:
+                end = offset + 2
+            offset = pointer
+            jumps += 1
+            continue
+        if length == 0:
+            offset += 1
+            break
+        if offset + 1 + length > len(data):
+            raise DNSError("label runs past end of message")
+        labels.append(data[offset + 1:offset + 1 + length].decode("ascii", "replace"))
+        offset += 1 + length
+
+    return normalize(".".join(labels)), end if end is not None else offset
+
+
+def decode_rdata(data: bytes, record_type: int, offset: int, length: int) -> str:
+    """Render the rdata of one answer as text."""
+    rdata = data[offset:offset + length]
+    if record_type in (RECORD_TYPES["A"], RECORD_TYPES["AAAA"]):
+        try:
+            address = ipaddress.IPv4Address if record_type == RECORD_TYPES["A"] else ipaddress.IPv6Address
+            return str(address(rdata))
+        except ValueError as e:
+            raise DNSError(f"bad address rdata: {e}") from e
+    if record_type in (RECORD_TYPES["CNAME"], RECORD_TYPES["NS"]):
+        return read_name(data, offset)[0]
+    if record_type == RECORD_TYPES["MX"]:
+        # Cloudflare keeps the preference apart from the content, so compare the exchange only
+        if length < 3:
+            raise DNSError("short MX rdata")
+        return read_name(data, offset + 2)[0]
+    if record_type == RECORD_TYPES["TXT"]:
+        parts = []
+        i = 0
+        while i < len(rdata):
+            parts.append(rdata[i + 1:i + 1 + rdata[i]].decode("utf-8", "replace"))
+            i += 1 + rdata[i]
+        return "".join(parts)
+    return rdata.hex()
+
+
+def parse_response(data: bytes, query_id: int) -> tuple[bool, list[tuple[str, str, str]]]:
+    """Decode a response; return (truncated, [(name, type, value), ...])."""
+    if len(data) < 12:
+        raise DNSError("short response")
+    response_id, flags, qdcount, ancount, _, _ = struct.unpack("!HHHHHH", data[:12])
+    if response_id != query_id:
+        raise DNSError("response ID mismatch")
+    if flags & FLAG_TC:
+        return True, []
+    rcode = flags & 0x000F
+    if rcode not in (0, 3):  # NXDOMAIN is a valid "not there yet"
+        raise DNSError(f"rcode {rcode}")
+
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = read_name(data, offset)
+        offset += 4
+        if offset > len(data):
+            raise DNSError("question runs past end of message")
+
+    answers = []
+    for _ in range(ancount):
+        name, offset = read_name(data, offset)
+        if offset + 10 > len(data):
+            raise DNSError("answer header runs past end of message")
+        record_type, _, _, length = struct.unpack("!HHIH", data[offset:offset + 10])
+        offset += 10
+        if offset + length > len(data):
+            raise DNSError("rdata runs past end of message")
+        value = decode_rdata(data, record_type, offset, length)
+        answers.append((name, TYPE_NAMES.get(record_type, str(record_type)), value))
+        offset += length
+
+    return False, answers
+
+
+class _UDPQuery(asyncio.DatagramProtocol):
+    def __init__(self, payload: bytes, future: asyncio.Future):
+        self.payload = payload
+        self.future = future
+
+    def connection_made(self, transport):
+        transport.sendto(self.payload)
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+async def query_udp(host: str, port: int, payload: bytes, timeout: float) -> bytes:
+    """Send one datagram and wait for the reply."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    transport, _ = await loop.create_datagram_endpoint(
+        lambda: _UDPQuery(payload, future), remote_addr=(host, port)
+    )
+    try:
+        return await asyncio.wait_for(future, timeout)
+    finally:
+        transport.close()
+
+
+async def query_tcp(host: str, port: int, payload: bytes, timeout: float) -> bytes:
+    """Send a length-prefixed query over TCP (used when UDP was truncated)."""
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(struct.pack("!H", len(payload)) + payload)
+        await writer.drain()
+        length = struct.unpack("!H", await asyncio.wait_for(reader.readexactly(2), timeout))[0]
+        return await asyncio.wait_for(reader.readexactly(length), timeout)
+    finally:
+        writer.close()
+
+
+async def query(resolver: str, name: str, record_type: str, timeout: float = QUERY_TIMEOUT) -> list[tuple[str, str, str]]:
+    """Resolve name/type at one resolver, falling back to TCP on truncation."""
+    host, port = parse_resolver(resolver)
+    query_id = random.randint(0, 0xFFFF)
+    payload = build_query(name, record_type, query_id)
+
+    truncated, answers = parse_response(await query_udp(host, port, payload, timeout), query_id)
+    if truncated:
+        _, answers = parse_response(await query_tcp(host, port, payload, timeout), query_id)
+    return answers
+
+
+def matches(check: dict, answers: list[tuple[str, str, str]]) -> bool:
+    """Return True when the answers satisfy a check.
+
+    A check with expected=None only needs some answer of its type (used for
+    proxied Cloudflare records, which resolve to edge IPs rather than the
+    configured CNAME target). With "exact" the answers must be the expected
+    set; otherwise they only need to include it, since a name can also hold
+    values this repo does not manage.
+    """
+    # TXT values are case-sensitive; names and addresses are not
+    clean = (lambda v: v) if check["type"] == "TXT" else normalize
+    values = {clean(value) for _, record_type, value in answers if record_type == check["type"]}
+    if check.get("expected") is None:
+        return bool(values)
+    expected = {clean(value) for value in check["expected"]}
+    return values == expected if check.get("exact", True) else expected <= values
+
+
+async def wait_for_check(check: dict, resolver: str, deadline: float) -> dict:
+    """Poll one resolver with exponential backoff until it serves the check."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    delay = INITIAL_DELAY
+    attempts = 0
+    last = None
+
+    while True:
+        attempts += 1
+        try:
+            answers = await query(resolver, check["name"], check["type"])
+            last = sorted(value for _, _, value in answers)
+            if matches(check, answers):
+                return {"ok": True, "seconds": loop.time() - start, "attempts": attempts, "last": last}
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, OSError, DNSError) as e:
+            last = f"error: {str(e) or type(e).__name__}"
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return {"ok": False, "seconds": loop.time() - start, "attempts": attempts, "last": last}
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, MAX_DELAY)
+
+
+async def verify_async(checks: list[dict], resolvers: list[str], timeout: float) -> list[tuple[dict, str, dict]]:
+    """Run every (check, resolver) pair concurrently under one deadline."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    pairs = [(check, resolver) for check in checks for resolver in resolvers]
+    results = await asyncio.gather(*(wait_for_check(c, r, deadline) for c, r in pairs))
+    return [(check, resolver, result) for (check, resolver), result in zip(pairs, results)]
+
+
+def verify(checks: list[dict], resolvers: list[str] | None = None, timeout: float = DEADLINE) -> bool:
+    """Verify checks against all resolvers and print time-to-propagation."""
+    resolvers = resolvers or RESOLVERS
+    print(f"\n🔎 Verifying {len(checks)} checks against {len(resolvers)} resolvers "
+          f"(deadline {timeout:.0f}s)...")
+
+    results = asyncio.run(verify_async(checks, resolvers, timeout))
+
+    all_ok = True
+    current = None
+    for check, resolver, result in results:
+        if check is not current:
+            expected = ", ".join(check["expected"]) if check.get("expected") else "any answer"
+            print(f"  📍 {check['type']} {check['name']} -> {expected}")
+            current = check
+        if result["ok"]:
+            print(f"    ✅ {resolver}: {result['seconds']:.1f}s ({result['attempts']} queries)")
+        else:
+            all_ok = False
+            print(f"    ❌ {resolver}: not propagated after {result['seconds']:.1f}s (last: {result['last']})")
+
+    return all_ok
+
+
+def record_checks(dns_records: list[dict]) -> list[dict]:
+    """Build checks for the records managed by dns_cloudflare.py.
+
+    Records sharing a name and type form one check on the whole set. Only a
+    pruned zone is expected to serve exactly the configured values.
+    """
+    from dns_cloudflare import full_name
+
+    checks = {}
+    for zone_config in dns_records:
+        zone_name = zone_config["zone_name"]
+        for record in zone_config["records"]:
+            name = normalize(full_name(record["name"], zone_name))
+            if record.get("proxied"):
+                # Proxied records are flattened to Cloudflare edge addresses
+                checks.setdefault((name, "A", True), {"name": name, "type": "A", "expected": None})
+                continue
+            if record["type"] not in RECORD_TYPES:
+                print(f"  ⚠️ Cannot verify {record['type']} {name}, skipping")
+                continue
+            check = checks.setdefault((name, record["type"], False), {
+                "name": name, "type": record["type"], "expected": [], "exact": bool(zone_config.get("prune")),
+            })
+            check["expected"].append(record["content"])
+    return list(checks.values())
+
+
+def nameserver_checks(domains: list[str], nameservers: list[str]) -> list[dict]:
+    """Build checks for the nameservers set by dns_spaceship.py."""
+    return [{"name": domain, "type": "NS", "expected": nameservers} for domain in domains]
+
+
+def main():
+    """Verify both the Cloudflare records and the Spaceship nameservers."""
+    print("=" * 60)
+    print("🔷 DNS Propagation Check")
+    print("=" * 60)
+
+    import dns_cloudflare
+    import dns_spaceship
+
+    checks = nameserver_checks(dns_spaceship.DOMAINS, dns_spaceship.CLOUDFLARE_NS)
+    checks += record_checks(dns_cloudflare.DNS_RECORDS)
+
+    start_time = time.time()
+    success = verify(checks)
+
+    print("\n" + "=" * 60)
+    icon = "✅" if success else "❌"
+    print(f"{icon} Propagation check {'passed' if success else 'failed'} ({time.time() - start_time:.1f}s)")
+    print("=" * 60)
+    return success
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
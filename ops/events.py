@@ -0,0 +1,82 @@
+"""
+Structured Events
+Optional JSON-lines event stream and machine-readable summary for the ops
+scripts, so CI can ingest timings without scraping the human output.
+
+OPS_EVENTS_FILE: append one JSON object per event to this path ("-" for stderr)
+OPS_SUMMARY_FILE: write the final summary object to this path
+Child processes inherit both, so provider scripts stream into the same file.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Configuration
+EVENTS_FILE = os.getenv("OPS_EVENTS_FILE")
+SUMMARY_FILE = os.getenv("OPS_SUMMARY_FILE")
+
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    """Return True when an event stream was requested."""
+    return bool(EVENTS_FILE)
+
+
+def emit(event: str, **fields):
+    """Append one event; a no-op unless OPS_EVENTS_FILE is set.
+
+    Every event carries wall-clock (ts) and monotonic (mono) timestamps, the
+    emitting script and its pid; values must be JSON serialisable.
+    """
+    if not EVENTS_FILE:
+        return
+    record = {
+        "event": event,
+        "ts": time.time(),
+        "mono": time.monotonic(),
+        "script": Path(sys.argv[0]).stem,
+        "pid": os.getpid(),
+        **fields,
+    }
+    line = json.dumps(record, default=str) + "\n"
+    with _lock:
+        if EVENTS_FILE == "-":
+            sys.stderr.write(line)
+            sys.stderr.flush()
+            return
+        # One write per line in append mode keeps concurrent writers from interleaving
+        with open(EVENTS_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+@contextmanager
+def phase(name: str, **fields):
+    """Emit phase_start/phase_end around a block.
+
+    Yields a dict whose contents (bytes, files, url, ...) are added to the
+    phase_end event; an exception is recorded as the phase error.
+    """
+    emit("phase_start", phase=name, **fields)
+    extra = {}
+    start = time.monotonic()
+    try:
+        yield extra
+    except BaseException as e:
+        emit("phase_end", phase=name, duration=time.monotonic() - start,
+             **{**fields, **extra, "ok": False, "error": str(e) or type(e).__name__})
+        raise
+    emit("phase_end", phase=name, duration=time.monotonic() - start, **{"ok": True, **fields, **extra})
+
+
+def summary(**data):
+    """Emit the final summary event and write it to OPS_SUMMARY_FILE."""
+    emit("summary", **data)
+    if SUMMARY_FILE:
+        payload = {"script": Path(sys.argv[0]).stem, "ts": time.time(), **data}
+        Path(SUMMARY_FILE).write_text(json.dumps(payload, indent=2, default=str) + "\n")
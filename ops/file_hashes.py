@@ -0,0 +1,144 @@
+"""
+File Hashing Helper
+Streams files through sha1/sha256 and remembers the digests on disk,
+so unchanged files are never read twice.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import profiling
+
+# Configuration
+CACHE_DIR = Path(os.getenv("OPS_CACHE_DIR", Path(__file__).parent / ".cache"))
+INDEX_PATH = CACHE_DIR / "hash_index.json"
+BLOCK_SIZE = 1024 * 1024
+# Below this much uncached data a process pool costs more than it saves
+POOL_MIN_BYTES = 16 * 1024 * 1024
+HASH_WORKERS = int(os.getenv("OPS_HASH_WORKERS", "0")) or os.cpu_count() or 1
+
+_index = None
+_index_lock = threading.Lock()
+_index_dirty = False
+
+
+def hash_file(filepath: Path | str) -> tuple[str, str]:
+    """Stream a file in fixed-size blocks and return its (sha1, sha256)."""
+    sha1 = hashlib.sha1()
+    sha256 = hashlib.sha256()
+    buffer = bytearray(BLOCK_SIZE)
+    view = memoryview(buffer)
+
+    with open(filepath, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            sha1.update(view[:read])
+            sha256.update(view[:read])
+
+    return sha1.hexdigest(), sha256.hexdigest()
+
+
+def load_index() -> dict:
+    """Load the persistent (path, size, mtime) -> digests index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = json.loads(INDEX_PATH.read_text())
+            except (OSError, ValueError):
+                _index = {}
+        return _index
+
+
+def save_index():
+    """Write the index back to disk if anything changed."""
+    global _index_dirty
+    with _index_lock:
+        if _index is None or not _index_dirty:
+            return
+        INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename so concurrent deploy scripts never read a torn file
+        tmp = INDEX_PATH.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(_index, separators=(",", ":")))
+        os.replace(tmp, INDEX_PATH)
+        _index_dirty = False
+
+
+def prune_index(prefix: Path):
+    """Forget every indexed file under prefix (e.g. a deleted directory)."""
+    global _index_dirty
+    index = load_index()
+    prefix = str(Path(prefix).resolve())
+    with _index_lock:
+        stale = [key for key in index if key == prefix or key.startswith(prefix + os.sep)]
+        for key in stale:
+            del index[key]
+        _index_dirty = _index_dirty or bool(stale)
+    save_index()
+
+
+def seed_index(root: Path, files: dict[str, dict]):
+    """Index known digests for the files under root (e.g. a copy of a hashed tree)."""
+    global _index_dirty
+    index = load_index()
+    with _index_lock:
+        for relative, digests in files.items():
+            path = Path(root) / relative
+            stat = path.stat()
+            entry = [stat.st_size, stat.st_mtime_ns, digests["sha1"], digests["sha256"]]
+            key = str(path.resolve())
+            if stat.st_size == digests["size"] and index.get(key) != entry:
+                index[key] = entry
+                _index_dirty = True
+    save_index()
+
+
+def hash_files(paths: list[Path]) -> dict[Path, dict]:
+    """Return {path: {"size", "sha1", "sha256"}} using the index where possible."""
+    global _index_dirty
+    index = load_index()
+    results = {}
+    misses = []
+
+    for path in paths:
+        stat = path.stat()
+        key = str(path.resolve())
+        entry = index.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            results[path] = {"size": stat.st_size, "sha1": entry[2], "sha256": entry[3]}
+        else:
+            misses.append((path, key, stat))
+
+    if misses:
+        miss_bytes = sum(stat.st_size for _, _, stat in misses)
+        with profiling.span("hash_files", "hash", files=len(misses), bytes=miss_bytes):
+            if len(misses) > 1 and HASH_WORKERS > 1 and miss_bytes >= POOL_MIN_BYTES:
+                with ProcessPoolExecutor(max_workers=min(HASH_WORKERS, len(misses))) as pool:
+                    digests = list(pool.map(hash_file, [str(path) for path, _, _ in misses]))
+            else:
+                digests = [hash_file(path) for path, _, _ in misses]
+
+        with _index_lock:
+            for (path, key, stat), (sha1, sha256) in zip(misses, digests):
+                index[key] = [stat.st_size, stat.st_mtime_ns, sha1, sha256]
+                results[path] = {"size": stat.st_size, "sha1": sha1, "sha256": sha256}
+            _index_dirty = True
+        save_index()
+
+    return results
+
+
+def hash_tree(root: Path) -> dict[str, dict]:
+    """Hash every file under root, keyed by forward-slash relative path."""
+    files = sorted(p for p in Path(root).rglob("*") if p.is_file())
+    digests = hash_files(files)
+    return {
+        str(file.relative_to(root)).replace("\\", "/"): digests[file]
+        for file in files
+    }
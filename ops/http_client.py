@@ -0,0 +1,128 @@
+"""
+HTTP Client Helper
+Pooled sessions and retry with backoff for the ops API clients
+"""
+
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Callable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import deadline
+import profiling
+
+# Configuration
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0  # seconds, doubled on every attempt
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# One adapter (and so one set of per-host connection pools) per process, so
+# providers running in the same interpreter reuse each other's connections
+SHARED_POOL_SIZE = 32
+
+_retry_counters = contextvars.ContextVar("retry_counters", default=())
+_retries_lock = threading.Lock()
+_adapter = None
+_adapter_size = 0
+_adapter_lock = threading.Lock()
+
+
+def shared_adapter(pool_size: int) -> HTTPAdapter:
+    """Return the process-wide adapter, replacing it if `pool_size` doesn't fit."""
+    global _adapter, _adapter_size
+    with _adapter_lock:
+        if _adapter is None or _adapter_size < pool_size:
+            _adapter_size = max(pool_size, SHARED_POOL_SIZE)
+            _adapter = HTTPAdapter(pool_connections=_adapter_size, pool_maxsize=_adapter_size)
+        return _adapter
+
+
+def create_session(pool_size: int = 10, headers: dict | None = None) -> requests.Session:
+    """Create a keep-alive session whose pool fits `pool_size` concurrent requests.
+
+    Sessions differ only in their default headers; the connection pools
+    behind them are shared process-wide.
+    """
+    session = requests.Session()
+    adapter = shared_adapter(pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def retry_delay(attempt: int, response: requests.Response | None = None) -> float:
+    """Return how long to wait before retry number `attempt` (0-based)."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    return min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+
+
+@contextmanager
+def count_retries():
+    """Count the retries made inside the block, including by workers it binds.
+
+    Yields a dict whose "retries" entry grows as requests are retried.
+    Providers running side by side each count only their own.
+    """
+    counter = {"retries": 0}
+    token = _retry_counters.set(_retry_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _retry_counters.reset(token)
+
+
+def _count_retry():
+    with _retries_lock:
+        for counter in _retry_counters.get():
+            counter["retries"] += 1
+
+
+def with_retries(send: Callable[[], requests.Response], retries: int = MAX_RETRIES,
+                 label: str = "http") -> requests.Response:
+    """Call `send` until it returns a non-retryable response or retries run out.
+
+    `send` is called afresh on every attempt so request bodies such as open
+    files can be rebuilt. Connection errors are retried like 5xx responses;
+    the last error is raised once retries are exhausted. No attempt starts
+    after the deadline (deadline.DeadlineExceeded is raised instead).
+    """
+    for attempt in range(retries + 1):
+        deadline.check()
+        try:
+            with profiling.span(label, "http", attempt=attempt):
+                response = send()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == retries:
+                raise
+            _count_retry()
+            deadline.sleep(retry_delay(attempt))
+            continue
+
+        if response.status_code not in RETRY_STATUSES or attempt == retries:
+            return response
+        _count_retry()
+        deadline.sleep(retry_delay(attempt, response))
+
+
+def request(session: requests.Session, method: str, url: str, retries: int = MAX_RETRIES, **kwargs) -> requests.Response:
+    """Send a request on `session`, retrying on 429/5xx and connection errors.
+
+    Each attempt's timeout is clamped to the deadline.
+    """
+    label = f"{method} {urlsplit(url).path}"
+    timeout = kwargs.pop("timeout", None)
+
+    def send() -> requests.Response:
+        return session.request(method, url, timeout=deadline.clamp(timeout), **kwargs)
+
+    return with_retries(send, retries=retries, label=label)
@@ -0,0 +1,113 @@
+"""
+Cross-Origin Isolation Check
+Fetches each deployed site and reports whether it is cross-origin isolated
+(COOP same-origin plus COEP require-corp/credentialless on the page, CORP
+on assets), i.e. whether multithreaded WASM backends can run there.
+
+Usage: python isolation_check.py [url ...]  (defaults to every provider URL)
+Set PIXEL_OS_ARTIFACT to also check the headers on one of its hashed assets.
+"""
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import http_client
+import profiling
+from build_artifact import artifact_from_env, load_manifest
+from site_headers import ASSETS_DIR, HASHED_NAME
+
+# Configuration
+TIMEOUT = 30
+EXPECTED_PAGE = {
+    "cross-origin-opener-policy": {"same-origin"},
+    "cross-origin-embedder-policy": {"require-corp", "credentialless"},
+}
+EXPECTED_ASSET = {
+    "cross-origin-resource-policy": {"same-origin", "same-site", "cross-origin"},
+}
+
+
+def header_value(response, name: str) -> str | None:
+    """Return a header's policy token, without report-to parameters."""
+    value = response.headers.get(name)
+    if value is None:
+        return None
+    return value.split(";")[0].strip().lower()
+
+
+def missing_headers(response, expected: dict[str, set[str]]) -> list[str]:
+    """List the expected headers a response lacks or sets to another value."""
+    problems = []
+    for name, allowed in expected.items():
+        value = header_value(response, name)
+        if value not in allowed:
+            problems.append(f"{name}: {value or 'missing'}")
+    return problems
+
+
+def sample_asset(artifact_path: Path) -> str | None:
+    """Pick a hashed asset from an artifact to check the asset headers on."""
+    for path in sorted(load_manifest(artifact_path)["files"]):
+        if path.startswith(f"{ASSETS_DIR}/") and HASHED_NAME.search(path):
+            return path
+    return None
+
+
+def check_site(session, base_url: str, asset_path: str | None = None) -> dict:
+    """Check one site; return {"isolated", "problems", "error"}."""
+    base_url = base_url.rstrip("/")
+    try:
+        page = http_client.request(session, "GET", f"{base_url}/", timeout=TIMEOUT)
+        problems = [f"page {p}" for p in missing_headers(page, EXPECTED_PAGE)]
+        if asset_path:
+            asset = http_client.request(session, "HEAD", f"{base_url}/{asset_path}", timeout=TIMEOUT,
+                                        allow_redirects=True)
+            problems += [f"asset {p}" for p in missing_headers(asset, EXPECTED_ASSET)]
+    except Exception as e:
+        return {"isolated": False, "problems": [], "error": str(e)}
+    return {"isolated": not problems, "problems": problems, "error": None}
+
+
+def check_sites(sites: dict[str, str], asset_path: str | None = None) -> dict[str, dict]:
+    """Check every {name: url} concurrently and print a report."""
+    session = http_client.create_session(pool_size=max(1, len(sites)))
+    print_lock = threading.Lock()
+
+    def run(item: tuple[str, str]) -> tuple[str, dict]:
+        name, url = item
+        result = check_site(session, url, asset_path)
+        with print_lock:
+            if result["isolated"]:
+                print(f"  🔒 {name}: cross-origin isolated")
+            elif result["error"]:
+                print(f"  ⚠️ {name}: check failed ({result['error']})")
+            else:
+                print(f"  🔓 {name}: not isolated ({'; '.join(result['problems'])})")
+        return name, result
+
+    print("\n🔎 Cross-origin isolation:")
+    with ThreadPoolExecutor(max_workers=max(1, len(sites))) as pool:
+        return dict(pool.map(run, sites.items()))
+
+
+def main(urls: list[str] | None = None):
+    """Check the given URLs, or every provider's primary URL."""
+    if urls:
+        sites = {url: url for url in urls}
+    else:
+        from deploy_all import PROVIDER_URLS
+        sites = PROVIDER_URLS
+
+    artifact_path = artifact_from_env()
+    results = check_sites(sites, sample_asset(artifact_path) if artifact_path else None)
+    isolated = sum(1 for result in results.values() if result["isolated"])
+    print(f"\nTotal: {isolated}/{len(results)} sites cross-origin isolated")
+    return isolated == len(results)
+
+
+if __name__ == "__main__":
+    profiling.init()
+    success = main(sys.argv[1:] or None)
+    sys.exit(0 if success else 1)
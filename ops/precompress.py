@@ -0,0 +1,178 @@
+"""
+Precompression Stage
+Compresses every compressible file of a build artifact at maximum gzip and
+brotli levels, once per unique content. Outputs are cached by sha256, so
+chunks that didn't change between releases are never recompressed.
+"""
+
+import gzip
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from build_artifact import CACHE_DIR, DIST_DIR, load_manifest
+
+try:
+    import brotli
+except ImportError:  # optional: pip install Brotli
+    brotli = None
+
+# Configuration
+# Off until a provider sets SERVES_PRECOMPRESSED: none of the current hosts
+# serve .br/.gz siblings, so compressing before the fan-out only adds time
+ENABLED = os.getenv("OPS_PRECOMPRESS", "False").lower() == "true"
+COMPRESSED_DIR = CACHE_DIR / "compressed"
+INDEX_NAME = "precompressed.json"
+VARIANTS_DIR = "dist-precompressed"
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+MIN_SIZE = 1024  # smaller files gain nothing worth a variant
+MAX_RATIO = 0.95  # keep a variant only if it saves at least 5%
+COMPRESS_WORKERS = int(os.getenv("OPS_COMPRESS_WORKERS", "0")) or os.cpu_count() or 1
+COMPRESS_CACHE_MAX_BYTES = int(os.getenv("OPS_COMPRESS_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+COMPRESSIBLE = {
+    ".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt",
+    ".xml", ".wasm", ".webmanifest", ".ico", ".ttf", ".otf",
+}
+EXTENSIONS = {"gzip": ".gz", "br": ".br"}
+
+
+def encodings() -> list[str]:
+    """Return the encodings this machine can produce."""
+    return ["br", "gzip"] if brotli else ["gzip"]
+
+
+def cache_path(sha256: str, encoding: str) -> Path:
+    """Return where the compressed output for a content hash is cached."""
+    return COMPRESSED_DIR / sha256[:2] / f"{sha256}{EXTENSIONS[encoding]}"
+
+
+def compress_file(source: str, sha256: str, wanted: list[str]) -> dict[str, int]:
+    """Compress one file into the cache; return {encoding: compressed size}."""
+    data = Path(source).read_bytes()
+    sizes = {}
+    for encoding in wanted:
+        if encoding == "br":
+            compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+        else:
+            # mtime=0 keeps the output byte-identical across runs
+            compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+        target = cache_path(sha256, encoding)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(f"{target.suffix}.{os.getpid()}.tmp")
+        tmp.write_bytes(compressed)
+        os.replace(tmp, target)
+        sizes[encoding] = len(compressed)
+    return sizes
+
+
+def precompress_artifact(artifact_path: Path) -> dict[str, dict[str, int]]:
+    """Compress an artifact's files and return {path: {encoding: size}}.
+
+    Only variants at most MAX_RATIO of the original are listed. The result
+    is stored next to the manifest, so a cached build costs nothing.
+    """
+    index_path = Path(artifact_path) / INDEX_NAME
+    wanted = encodings()
+    files = load_manifest(artifact_path)["files"]
+    if index_path.exists():
+        index = json.loads(index_path.read_text())
+        # The outputs may have been evicted since the index was written
+        cached = [cache_path(files[path]["sha256"], e) for path, variants in index["files"].items() for e in variants]
+        if index["encodings"] == wanted and all(p.exists() for p in cached):
+            for p in cached:
+                os.utime(p)
+            return index["files"]
+
+    dist_path = Path(artifact_path) / DIST_DIR
+    candidates = {
+        path: info for path, info in files.items()
+        if info["size"] >= MIN_SIZE and Path(path).suffix.lower() in COMPRESSIBLE
+    }
+
+    # One job per unique content; cached outputs are only stat()ed
+    sizes = {}
+    jobs = {}
+    for path, info in candidates.items():
+        sha256 = info["sha256"]
+        if sha256 in sizes or sha256 in jobs:
+            continue
+        cached = {e: cache_path(sha256, e) for e in wanted}
+        if all(p.exists() for p in cached.values()):
+            for p in cached.values():
+                os.utime(p)
+            sizes[sha256] = {e: p.stat().st_size for e, p in cached.items()}
+        else:
+            jobs[sha256] = str(dist_path / path)
+
+    if jobs:
+        print(f"🗜️  Compressing {len(jobs)} files ({', '.join(wanted)}), "
+              f"{len(sizes)} reused from cache")
+        if len(jobs) > 1 and COMPRESS_WORKERS > 1:
+            with ProcessPoolExecutor(max_workers=min(COMPRESS_WORKERS, len(jobs))) as pool:
+                results = pool.map(compress_file, jobs.values(), jobs.keys(), [wanted] * len(jobs))
+                sizes.update(zip(jobs.keys(), results))
+        else:
+            for sha256, source in jobs.items():
+                sizes[sha256] = compress_file(source, sha256, wanted)
+    elif candidates:
+        print(f"⚡ All {len(candidates)} compressed variants reused from cache")
+
+    variants = {}
+    for path, info in candidates.items():
+        kept = {e: size for e, size in sizes[info["sha256"]].items() if size <= info["size"] * MAX_RATIO}
+        if kept:
+            variants[path] = kept
+
+    index_path.write_text(json.dumps({"encodings": wanted, "files": variants}, indent=2))
+    evict_cache()
+    return variants
+
+
+def stage_variants(artifact_path: Path) -> Path:
+    """Return a dist tree with file.br/file.gz siblings, for hosts that serve them.
+
+    Files are hard-linked from the artifact and the cache where possible.
+    """
+    artifact_path = Path(artifact_path)
+    staged = artifact_path / VARIANTS_DIR
+    if staged.exists():
+        return staged
+
+    variants = precompress_artifact(artifact_path)
+    files = load_manifest(artifact_path)["files"]
+    staging = artifact_path / f".{VARIANTS_DIR}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    for path, info in files.items():
+        sources = [(artifact_path / DIST_DIR / path, staging / path)]
+        for encoding in variants.get(path, {}):
+            sources.append((cache_path(info["sha256"], encoding), staging / f"{path}{EXTENSIONS[encoding]}"))
+        for source, target in sources:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+
+    try:
+        staging.rename(staged)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+    return staged
+
+
+def evict_cache(max_bytes: int = COMPRESS_CACHE_MAX_BYTES):
+    """Delete least recently used compressed outputs until the cache fits."""
+    if not COMPRESSED_DIR.exists():
+        return
+    entries = [(p.stat().st_mtime, p.stat().st_size, p) for p in COMPRESSED_DIR.glob("*/*") if p.is_file()]
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
@@ -0,0 +1,190 @@
+"""
+Process Runner
+Runs child commands for the ops scripts: streams output into a bounded
+tail plus a log file on disk, kills the whole process group on timeout,
+and records the child's CPU time and peak RSS.
+"""
+
+import collections
+import os
+import re
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import deadline
+import profiling
+from deadline import DEADLINE_ENV
+
+# Configuration
+CACHE_DIR = Path(os.getenv("OPS_CACHE_DIR", Path(__file__).parent / ".cache"))
+LOG_DIR = CACHE_DIR / "logs"
+TAIL_LINES = 200
+KEEP_LOGS = 50
+KILL_GRACE = 5  # seconds between SIGTERM and SIGKILL
+POLL_INTERVAL = 0.05
+
+
+def new_log_path(cmd: list[str]) -> Path:
+    """Pick a log file name from the command (or any label parts)."""
+    label = "-".join(Path(part).name for part in cmd[:3])
+    label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label)[:60]
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    return LOG_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}-{label}.log"
+
+
+def prune_logs():
+    """Keep only the newest KEEP_LOGS log files."""
+    logs = sorted(LOG_DIR.glob("*.log"), key=lambda p: p.stat().st_mtime)
+    for old in logs[:-KEEP_LOGS]:
+        old.unlink(missing_ok=True)
+
+
+def _kill_tree(proc: subprocess.Popen):
+    """Terminate the child and everything it spawned."""
+    if sys.platform == "win32":
+        subprocess.run(["taskkill", "/T", "/F", "/PID", str(proc.pid)], capture_output=True)
+        return
+
+    try:
+        os.killpg(proc.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    deadline = time.time() + KILL_GRACE
+    while time.time() < deadline:
+        # Reap the leader so a zombie doesn't keep the group alive
+        proc.poll()
+        try:
+            os.killpg(proc.pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(POLL_INTERVAL)
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _wait(proc: subprocess.Popen, deadline: float) -> tuple[bool, dict]:
+    """Wait for the child until the deadline; return (finished, usage)."""
+    if sys.platform == "win32" or not hasattr(os, "wait4"):
+        try:
+            proc.wait(timeout=max(0, deadline - time.time()))
+            return True, {}
+        except subprocess.TimeoutExpired:
+            return False, {}
+
+    # wait4 reaps the child and returns its rusage, including reaped grandchildren
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            maxrss = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            return True, {"cpu_time": rusage.ru_utime + rusage.ru_stime, "peak_rss": maxrss}
+        if time.time() >= deadline:
+            return False, {}
+        time.sleep(POLL_INTERVAL)
+
+
+def run_process(cmd: list[str], cwd: str = None, timeout: float = 300, env: dict = None,
+                on_line=None) -> dict:
+    """Run a command and return a result dict.
+
+    Keys: returncode (None on timeout), timed_out, duration, cpu_time and
+    peak_rss (bytes; None where the platform can't report them), tail (the
+    last TAIL_LINES lines of combined stdout/stderr) and log_path (the full
+    output on disk). on_line, if given, is called with each output line.
+    """
+    run_env = os.environ.copy()
+    if env:
+        run_env.update(env)
+
+    # Every child command is cut off at the deadline, however long its own
+    # timeout is, and passes it on to its own children
+    deadline_at = deadline.current()
+    if deadline_at:
+        timeout = max(0.0, min(timeout, deadline_at - time.time()))
+        run_env[DEADLINE_ENV] = str(deadline_at)
+
+    log_path = new_log_path(cmd)
+    tail = collections.deque(maxlen=TAIL_LINES)
+    start_time = time.time()
+
+    popen_kwargs = {}
+    if sys.platform == "win32":
+        popen_kwargs["shell"] = True
+        popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        # Own session/process group, so npx's grandchildren die with it
+        popen_kwargs["start_new_session"] = True
+
+    result = {
+        "returncode": None, "timed_out": False, "duration": 0.0,
+        "cpu_time": None, "peak_rss": None, "tail": "", "log_path": str(log_path),
+    }
+
+    with open(log_path, "w", encoding="utf-8", errors="replace") as log:
+        try:
+            proc = subprocess.Popen(
+                cmd, cwd=cwd, env=run_env,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                text=True, encoding="utf-8", errors="replace", bufsize=1,
+                **popen_kwargs
+            )
+        except Exception as e:
+            result["tail"] = str(e)
+            result["duration"] = time.time() - start_time
+            return result
+
+        def pump():
+            try:
+                for line in proc.stdout:
+                    log.write(line)
+                    tail.append(line)
+                    if on_line:
+                        on_line(line.rstrip("\n"))
+            except (ValueError, OSError):
+                # The log or pipe was closed after a timed-out join
+                pass
+
+        reader = threading.Thread(target=pump, daemon=True)
+        reader.start()
+
+        try:
+            finished, usage = _wait(proc, start_time + timeout)
+        except BaseException:
+            # The child has its own session, so Ctrl-C never reached it
+            _kill_tree(proc)
+            proc.wait()
+            raise
+        if not finished:
+            _kill_tree(proc)
+            proc.wait()
+            result["timed_out"] = True
+            tail.append(f"Command timed out after {timeout}s\n")
+        else:
+            result["returncode"] = proc.returncode
+            result.update(usage)
+
+        # Orphaned grandchildren may hold the pipe open; don't wait forever
+        reader.join(timeout=KILL_GRACE)
+        if not reader.is_alive():
+            proc.stdout.close()
+
+    result["duration"] = time.time() - start_time
+    result["tail"] = "".join(tail)
+    profiling.add_span(
+        " ".join(Path(part).name for part in cmd[:3]), start_time * 1_000_000, time.time() * 1_000_000,
+        "process", returncode=result["returncode"], cpu_time=result["cpu_time"], peak_rss=result["peak_rss"]
+    )
+    prune_logs()
+    return result
+
+
+def run_command(cmd: list[str], cwd: str = None, timeout: float = 300, env: dict = None) -> tuple[bool, str]:
+    """Run a command and return success status and output (its tail)."""
+    result = run_process(cmd, cwd=cwd, timeout=timeout, env=env)
+    return result["returncode"] == 0, result["tail"]
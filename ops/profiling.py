@@ -0,0 +1,177 @@
+"""
+Profiling Hooks
+Timing spans (and optionally cProfile) for the ops scripts, written as a
+Chrome trace that chrome://tracing, Perfetto and speedscope can open.
+
+Run deploy_all.py or a provider script with --profile (add --cprofile for
+per-phase cProfile dumps). Child processes inherit the settings through the
+environment and write their own spans; the top-level script merges them
+into <profile dir>/trace.json when it exits.
+"""
+
+import atexit
+import cProfile
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Configuration
+CACHE_DIR = Path(os.getenv("OPS_CACHE_DIR", Path(__file__).parent / ".cache"))
+PROFILES_DIR = CACHE_DIR / "profiles"
+PROFILE_ENV = "OPS_PROFILE_DIR"  # set while profiling; children write their spans here
+CPROFILE_ENV = "OPS_PROFILE_CPROFILE"
+TRACE_NAME = "trace.json"
+
+PROFILED_CATEGORY = "phase"  # --cprofile profiles these spans only
+
+_spans = []
+_lock = threading.Lock()
+_root = False
+_main_start = None
+_profiling = threading.local()  # whether this thread's profiler is running
+_dump_ids = itertools.count(1)
+
+
+def enabled() -> bool:
+    """Return True when this process is being profiled."""
+    return bool(os.getenv(PROFILE_ENV))
+
+
+def _now_us() -> float:
+    # Wall clock, so spans from different processes line up
+    return time.time_ns() / 1000
+
+
+def _process_start_us() -> float | None:
+    """Return when this process started, where the platform exposes it."""
+    try:
+        stat = Path(f"/proc/{os.getpid()}/stat").read_text()
+        started_after_boot = int(stat.rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        uptime = float(Path("/proc/uptime").read_text().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return (time.time() - (uptime - started_after_boot)) * 1_000_000
+
+
+def add_span(name: str, start_us: float, end_us: float, category: str = "ops", **args):
+    """Record a completed span for the current thread."""
+    if not enabled():
+        return
+    event = {
+        "name": name, "cat": category, "ph": "X",
+        "ts": start_us, "dur": max(0.0, end_us - start_us),
+        "pid": os.getpid(), "tid": threading.get_native_id(),
+    }
+    if args:
+        event["args"] = args
+    with _lock:
+        _spans.append(event)
+
+
+@contextmanager
+def span(name: str, category: str = "ops", **args):
+    """Time a block as a span; with --cprofile also dump a cProfile of phase spans.
+
+    A profiler replaces whatever profiler the thread already runs, so only
+    the outermost phase span of each thread is profiled; the spans nested
+    in it (HTTP attempts, hashing, inner phases) show up in its profile.
+    """
+    if not enabled():
+        yield
+        return
+
+    profiler = None
+    if os.getenv(CPROFILE_ENV) and category == PROFILED_CATEGORY and not getattr(_profiling, "active", False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            _profiling.active = True
+        except ValueError:
+            profiler = None
+
+    start = _now_us()
+    try:
+        yield
+    finally:
+        add_span(name, start, _now_us(), category, **args)
+        if profiler:
+            profiler.disable()
+            _profiling.active = False
+            # Phases can repeat (e.g. two "create" phases), so number the dumps
+            label = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+            profiler.dump_stats(Path(os.environ[PROFILE_ENV]) / f"{os.getpid()}-{next(_dump_ids)}-{label}.prof")
+
+
+def _write_spans():
+    """Write this process's spans to the profile dir."""
+    profile_dir = Path(os.environ[PROFILE_ENV])
+    script = Path(sys.argv[0]).stem
+    meta = [
+        {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": f"{script} ({os.getpid()})"}},
+    ]
+    with _lock:
+        threads = {event["tid"] for event in _spans}
+        events = meta + [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+             "args": {"name": "main" if tid == threading.main_thread().native_id else f"worker {tid}"}}
+            for tid in threads
+        ] + _spans
+    (profile_dir / f"{os.getpid()}.spans.json").write_text(json.dumps(events))
+
+
+def merge_trace(profile_dir: Path) -> Path:
+    """Merge every process's spans into one Chrome trace file."""
+    events = []
+    for path in sorted(profile_dir.glob("*.spans.json")):
+        try:
+            events.extend(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    trace_path = profile_dir / TRACE_NAME
+    trace_path.write_text(json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}))
+    return trace_path
+
+
+def _finish():
+    add_span(Path(sys.argv[0]).stem, _main_start, _now_us(), "main")
+    _write_spans()
+    if _root:
+        trace_path = merge_trace(Path(os.environ[PROFILE_ENV]))
+        print(f"\n🔬 Profile trace: {trace_path} (open in https://ui.perfetto.dev or https://speedscope.app)")
+
+
+def init(argv: list[str] = sys.argv):
+    """Enable profiling from --profile/--cprofile flags or the inherited env.
+
+    The flags are removed from argv so scripts that read their own arguments
+    don't see them.
+    """
+    global _root, _main_start
+    if "--cprofile" in argv:
+        argv.remove("--cprofile")
+        os.environ[CPROFILE_ENV] = "1"
+        if "--profile" not in argv:
+            argv.append("--profile")
+    if "--profile" in argv:
+        argv.remove("--profile")
+        if not enabled():
+            profile_dir = PROFILES_DIR / time.strftime("%Y%m%d-%H%M%S")
+            profile_dir.mkdir(parents=True, exist_ok=True)
+            os.environ[PROFILE_ENV] = str(profile_dir)
+            _root = True
+
+    if not enabled():
+        return
+
+    # Interpreter startup, imports and dotenv loading, up to this call
+    _main_start = _now_us()
+    started = _process_start_us()
+    if started:
+        add_span("startup", started, _main_start, "startup")
+    atexit.register(_finish)
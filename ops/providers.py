@@ -0,0 +1,129 @@
+"""
+Provider Runner
+Runs provider deploy scripts inside the current interpreter.
+
+Every deploy_<provider>.py exposes the same interface:
+    PROVIDER        display name, used for history and events
+    check_config()  report missing credentials, return True when deployable
+    deploy(dist, deadline_at)
+                    deploy a prebuilt dist directory, return success; start
+                    nothing (request, upload batch, command) after deadline_at
+and keeps its own main() for standalone runs. A provider whose host serves
+precompressed file.br/file.gz siblings sets SERVES_PRECOMPRESSED = True and
+is handed the precompressed tree instead of the plain dist.
+"""
+
+import contextvars
+import importlib
+import io
+import sys
+import threading
+import time
+from pathlib import Path
+
+import precompress
+from build_artifact import DIST_DIR
+from process_runner import KILL_GRACE, TAIL_LINES, new_log_path, prune_logs
+
+
+class ThreadOutput(io.TextIOBase):
+    """stdout replacement that sends each provider's writes to its own buffer.
+
+    The buffer follows the provider's context, so upload workers started
+    through deadline.bind write into it too; everything else writes
+    straight through to the real stream.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._buffer = contextvars.ContextVar("output_buffer", default=None)
+
+    def capture(self, buffer: io.StringIO | None):
+        """Route the calling context's output into buffer (None to stop)."""
+        self._buffer.set(buffer)
+
+    def write(self, text: str) -> int:
+        return (self._buffer.get() or self.stream).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+_output = None
+_output_lock = threading.Lock()
+
+
+def _thread_output() -> ThreadOutput:
+    global _output
+    with _output_lock:
+        if _output is None:
+            _output = ThreadOutput(sys.stdout)
+            sys.stdout = _output
+        return _output
+
+
+def load(script_name: str):
+    """Import a provider script as a module (e.g. "deploy_netlify.py")."""
+    return importlib.import_module(Path(script_name).stem)
+
+
+def dist_for(module, artifact_path: Path) -> Path:
+    """Pick the tree a provider deploys: plain dist or dist with precompressed siblings."""
+    if precompress.ENABLED and getattr(module, "SERVES_PRECOMPRESSED", False):
+        return precompress.stage_variants(artifact_path)
+    return Path(artifact_path) / DIST_DIR
+
+
+def run_provider(script_name: str, artifact_path: Path, timeout: float) -> dict:
+    """Deploy one provider in-process; the result matches process_runner.run_process.
+
+    The provider's output is captured into a log file and its tail, like a
+    child process. The timeout is passed to deploy() as its deadline, so
+    the provider, its upload workers and its child commands stop starting
+    work once it passes and in-flight requests time out. A provider still
+    running then is given KILL_GRACE seconds to unwind before it is
+    abandoned (a thread can't be killed).
+    """
+    output = _thread_output()
+    buffer = io.StringIO()
+    outcome = {}
+    start_time = time.time()
+    deadline_at = start_time + timeout
+
+    def target():
+        output.capture(buffer)
+        cpu_start = time.thread_time()
+        try:
+            # A provider that fails to import or stage fails alone, with the error in its log
+            module = load(script_name)
+            outcome["success"] = bool(module.deploy(dist_for(module, artifact_path), deadline_at))
+        except Exception as e:
+            print(f"❌ {type(e).__name__}: {e}")
+            outcome["success"] = False
+        finally:
+            outcome["cpu_time"] = time.thread_time() - cpu_start
+            output.capture(None)
+
+    worker = threading.Thread(target=target, name=f"provider-{Path(script_name).stem}", daemon=True)
+    worker.start()
+    worker.join(timeout)
+    timed_out = worker.is_alive()
+    if timed_out:
+        worker.join(KILL_GRACE)
+
+    text = buffer.getvalue()
+    if timed_out:
+        text += f"Provider timed out after {timeout}s\n"
+    log_path = new_log_path(["inprocess", script_name])
+    log_path.write_text(text, encoding="utf-8")
+    prune_logs()
+
+    return {
+        "returncode": None if timed_out else (0 if outcome.get("success") else 1),
+        "timed_out": timed_out,
+        "duration": time.time() - start_time,
+        "cpu_time": outcome.get("cpu_time"),
+        "peak_rss": None,  # shared with the whole process
+        "tail": "".join(text.splitlines(keepends=True)[-TAIL_LINES:]),
+        "log_path": str(log_path),
+    }
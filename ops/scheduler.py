@@ -0,0 +1,73 @@
+"""
+Deploy Scheduler
+Runs weighted jobs concurrently under a shared capacity budget
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class WeightedSemaphore:
+    """Semaphore where each holder consumes a weight instead of one slot."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._available = self.capacity
+        self._cond = threading.Condition()
+
+    def acquire(self, weight: int) -> int:
+        """Block until `weight` units are free; return the units taken."""
+        # A job heavier than the whole budget still runs, just on its own
+        weight = min(max(1, weight), self.capacity)
+        with self._cond:
+            while self._available < weight:
+                self._cond.wait()
+            self._available -= weight
+        return weight
+
+    def release(self, weight: int):
+        """Return `weight` units to the pool."""
+        with self._cond:
+            self._available += weight
+            self._cond.notify_all()
+
+
+def run_weighted(
+    jobs: list[tuple[str, int, Callable[[], Any]]],
+    max_concurrency: int,
+    on_start: Callable[[str], None] | None = None,
+    on_finish: Callable[[str, Any, float], None] | None = None,
+) -> dict[str, Any]:
+    """Run (name, weight, fn) jobs with at most `max_concurrency` weight in flight.
+
+    Jobs start as soon as enough capacity is free. Returns a mapping of job
+    name to the value returned by its callable.
+    """
+    semaphore = WeightedSemaphore(max_concurrency)
+    results = {}
+
+    def run(name: str, weight: int, fn: Callable[[], Any]):
+        taken = semaphore.acquire(weight)
+        try:
+            if on_start:
+                on_start(name)
+            start_time = time.time()
+            result = fn()
+            if on_finish:
+                on_finish(name, result, time.time() - start_time)
+            results[name] = result
+        finally:
+            semaphore.release(taken)
+
+    if not jobs:
+        return results
+
+    # One thread per job; the semaphore (not the pool) bounds the real work
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        futures = [pool.submit(run, name, weight, fn) for name, weight, fn in jobs]
+        for future in futures:
+            future.result()
+
+    return results
@@ -0,0 +1,190 @@
+"""
+Response Header Config
+Generates each platform's header configuration from the files of a build:
+content-hashed Vite assets are cached forever, HTML is always revalidated,
+and every response carries the COOP/COEP pair (plus CORP on assets) that
+makes the site cross-origin isolated, so WASM backends get SharedArrayBuffer.
+
+Cloudflare Pages and Netlify read a `_headers` file, Vercel reads the
+`headers` list of `vercel.json`. Neocities, GitHub Pages and Surge have no
+header configuration, so they keep their defaults.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import file_hashes
+
+# Configuration
+CACHE_DIR = Path(os.getenv("OPS_CACHE_DIR", Path(__file__).parent / ".cache"))
+CONFIG_DIR = CACHE_DIR / "config"
+ASSETS_DIR = "assets"
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Cross-origin isolation, matching the dev server in vite.config.ts
+CROSS_ORIGIN_ISOLATION = os.getenv("OPS_CROSS_ORIGIN_ISOLATION", "True").lower() == "true"
+ISOLATION_HEADERS = {
+    "Cross-Origin-Opener-Policy": "same-origin",
+    "Cross-Origin-Embedder-Policy": os.getenv("OPS_COEP", "require-corp"),
+}
+ASSET_CORP = {"Cross-Origin-Resource-Policy": "same-origin"}
+
+HEADERS_FILE = "_headers"
+VERCEL_CONFIG = "vercel.json"
+PLATFORM_FILES = {
+    "cloudflare": HEADERS_FILE,
+    "netlify": HEADERS_FILE,
+    "vercel": VERCEL_CONFIG,
+}
+
+# Vite names emitted chunks <name>-<hash>.<ext>, the hash being the last 8
+# base64url characters (which include "-") before the extension. A plain
+# lowercase word ("logo-wordmark.svg", "ort-wasm-simd-threaded.wasm") is not
+# a hash, so one needs a digit, capital or underscore; the lookahead keeps
+# the extension out of the match, so sub("") strips just the hash
+HASHED_NAME = re.compile(r"-(?=[a-z-]*[A-Z0-9_])[A-Za-z0-9_-]{8}(?=\.[^.]+$)")
+
+
+def list_files(dist_path: Path) -> list[str]:
+    """Return every file under dist as a forward-slash relative path."""
+    return sorted(
+        str(p.relative_to(dist_path)).replace("\\", "/")
+        for p in Path(dist_path).rglob("*") if p.is_file()
+    )
+
+
+def header_rules(files: list[str]) -> dict[str, dict[str, str]]:
+    """Map URL patterns ("/assets/*", "/index.html") to the headers they get.
+
+    Patterns never set the same header twice, because Cloudflare and
+    Netlify combine every rule that matches a path.
+    """
+    rules = {}
+    if CROSS_ORIGIN_ISOLATION:
+        rules["/*"] = dict(ISOLATION_HEADERS)
+
+    assets = [path for path in files if path.startswith(f"{ASSETS_DIR}/")]
+    if assets and all(HASHED_NAME.search(path) for path in assets):
+        rules[f"/{ASSETS_DIR}/*"] = {"Cache-Control": IMMUTABLE}
+    else:
+        # Unhashed files in assets/ (copied from public/) must stay revalidated
+        for path in assets:
+            if HASHED_NAME.search(path):
+                rules[f"/{path}"] = {"Cache-Control": IMMUTABLE}
+
+    if CROSS_ORIGIN_ISOLATION and assets:
+        rules.setdefault(f"/{ASSETS_DIR}/*", {}).update(ASSET_CORP)
+
+    for path in files:
+        if path.endswith(".html"):
+            rules[f"/{path}"] = {"Cache-Control": REVALIDATE}
+            if path == "index.html":
+                rules["/"] = {"Cache-Control": REVALIDATE}
+
+    return rules
+
+
+def render_headers_file(rules: dict[str, dict[str, str]], existing: str = "") -> str:
+    """Render rules in the `_headers` format shared by Cloudflare Pages and Netlify."""
+    blocks = []
+    for pattern, headers in rules.items():
+        blocks.append("\n".join([pattern] + [f"  {name}: {value}" for name, value in headers.items()]))
+    text = "\n".join(blocks) + "\n"
+    if existing.strip():
+        # Hand-written rules from public/_headers come last
+        text += "\n" + existing.strip() + "\n"
+    return text
+
+
+def vercel_source(pattern: str) -> str:
+    """Translate a `_headers` pattern into a vercel.json source."""
+    return pattern.replace("*", "(.*)")
+
+
+def render_vercel_config(rules: dict[str, dict[str, str]], existing: str = "") -> str:
+    """Render rules into vercel.json, keeping any other settings already there."""
+    config = json.loads(existing) if existing.strip() else {}
+    generated = [
+        {
+            "source": vercel_source(pattern),
+            "headers": [{"key": name, "value": value} for name, value in headers.items()],
+        }
+        for pattern, headers in rules.items()
+    ]
+    # Vercel applies later entries over earlier ones, so hand-written rules win
+    config["headers"] = generated + config.get("headers", [])
+    return json.dumps(config, indent=2) + "\n"
+
+
+def render(dist_path: Path, platform: str) -> tuple[str, str]:
+    """Return (file name, content) of a platform's header config for dist."""
+    name = PLATFORM_FILES[platform]
+    existing_file = Path(dist_path) / name
+    existing = existing_file.read_text() if existing_file.exists() else ""
+    rules = header_rules([path for path in list_files(dist_path) if path != name])
+    if name == VERCEL_CONFIG:
+        return name, render_vercel_config(rules, existing)
+    return name, render_headers_file(rules, existing)
+
+
+def config_files(dist_path: Path, platform: str) -> dict[str, Path]:
+    """Write a platform's header config outside dist; return {dist name: file}.
+
+    The shared artifact is never modified: uploaders send these files in
+    place of (or in addition to) the ones in dist.
+    """
+    name, content = render(dist_path, platform)
+    digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+    path = CONFIG_DIR / platform / digest / name
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(content)
+        os.replace(tmp, path)
+    return {name: path}
+
+
+def deploy_files(dist_path: Path, platform: str) -> tuple[dict[str, dict], dict[str, Path]]:
+    """Hash dist plus the generated config.
+
+    Returns ({path: {"size", "sha1", "sha256"}}, {path: file to upload}),
+    with the generated config replacing any copy in dist.
+    """
+    files = file_hashes.hash_tree(dist_path)
+    sources = {path: Path(dist_path) / path for path in files}
+    generated = config_files(dist_path, platform)
+    digests = file_hashes.hash_files(list(generated.values()))
+    for name, path in generated.items():
+        files[name] = digests[path]
+        sources[name] = path
+    return files, sources
+
+
+@contextmanager
+def staged_dist(dist_path: Path, platform: str):
+    """Yield a temporary copy of dist (hard-linked) with the header config added.
+
+    Used by the CLI deploy paths, which can only upload a directory.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        stage_path = Path(tmp) / Path(dist_path).name
+        shutil.copytree(dist_path, stage_path, copy_function=_link_or_copy)
+        for name, path in config_files(dist_path, platform).items():
+            target = stage_path / name
+            target.unlink(missing_ok=True)
+            shutil.copyfile(path, target)
+        yield stage_path
+
+
+def _link_or_copy(source: str, target: str):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
@@ -0,0 +1,20 @@
+import build_artifact
+import file_hashes
+
+
+def test_artifact_copy_is_hashed_from_the_manifest(monkeypatch, tmp_path):
+    monkeypatch.setattr(build_artifact, "ARTIFACTS_DIR", tmp_path / "artifacts")
+    monkeypatch.setattr(file_hashes, "INDEX_PATH", tmp_path / "hash_index.json")
+    monkeypatch.setattr(file_hashes, "_index", None)
+    dist = tmp_path / "dist"
+    (dist / "assets").mkdir(parents=True)
+    (dist / "index.html").write_text("<script src=/assets/index-BvQ3x9_k.js></script>")
+    (dist / "assets" / "index-BvQ3x9_k.js").write_text("console.log('pixel');")
+
+    artifact = build_artifact.create_artifact(dist)
+
+    def hash_file(path):
+        raise AssertionError(f"{path} was read again")
+
+    monkeypatch.setattr(file_hashes, "hash_file", hash_file)
+    assert file_hashes.hash_tree(artifact / build_artifact.DIST_DIR) == build_artifact.load_manifest(artifact)["files"]
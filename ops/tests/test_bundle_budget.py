@@ -0,0 +1,31 @@
+import hashlib
+import json
+
+import bundle_budget
+import precompress
+from bundle_budget import chunk_name
+
+
+def test_chunk_name_strips_only_content_hashes():
+    assert chunk_name("assets/index-BvQ3x9_k.js") == "assets/index.js"
+    assert chunk_name("assets/upscale-worker-D4f2a1c9.js") == "assets/upscale-worker.js"
+    assert chunk_name("assets/logo-wordmark.svg") == "assets/logo-wordmark.svg"
+    assert chunk_name("assets/ort-wasm-simd-threaded.wasm") == "assets/ort-wasm-simd-threaded.wasm"
+    assert chunk_name("assets/vendor-B-x9Qw3k.js") == "assets/vendor.js"
+
+
+def test_inventory_only_sizes_the_budget_metric(monkeypatch, tmp_path):
+    monkeypatch.setattr(precompress, "COMPRESSED_DIR", tmp_path / "compressed")
+    monkeypatch.setattr(precompress, "encodings", lambda: ["br", "gzip"])
+    artifact = tmp_path / "artifact"
+    (artifact / "dist" / "assets").mkdir(parents=True)
+    data = b"console.log('pixel');\n" * 200
+    (artifact / "dist" / "assets" / "index-BvQ3x9_k.js").write_bytes(data)
+    files = {"assets/index-BvQ3x9_k.js": {"size": len(data), "sha256": hashlib.sha256(data).hexdigest()}}
+    (artifact / "manifest.json").write_text(json.dumps({"files": files}))
+
+    result = bundle_budget.inventory(artifact)
+
+    assert result["encodings"] == [bundle_budget.METRIC]
+    assert set(result["chunks"]["assets/index.js"]) == {"raw", bundle_budget.METRIC, "files", "initial"}
+    assert not list((tmp_path / "compressed").rglob("*.br"))
@@ -0,0 +1,42 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import deadline
+
+
+@pytest.fixture(autouse=True)
+def no_release_deadline(monkeypatch):
+    monkeypatch.delenv(deadline.DEADLINE_ENV, raising=False)
+
+
+def test_nested_scope_only_shortens():
+    now = time.time()
+    with deadline.scope(now + 10):
+        with deadline.scope(now + 100):
+            assert deadline.current() == now + 10
+        with deadline.scope(now + 5):
+            assert deadline.current() == now + 5
+    assert deadline.current() is None
+
+
+def test_clamp_limits_timeout_and_raises_after_deadline():
+    with deadline.scope(time.time() + 2):
+        assert deadline.clamp(300) <= 2
+    with deadline.scope(time.time() - 1):
+        with pytest.raises(deadline.DeadlineExceeded):
+            deadline.clamp(300)
+
+
+def test_bound_workers_stop_at_the_deadline():
+    started = []
+
+    def work(i):
+        started.append(i)
+        time.sleep(0.2)
+
+    with deadline.scope(time.time() + 0.3), ThreadPoolExecutor(max_workers=1) as pool:
+        with pytest.raises(deadline.DeadlineExceeded):
+            list(pool.map(deadline.bind(work), range(10)))
+    assert len(started) < 10
@@ -0,0 +1,17 @@
+import deploy_all
+import deploy_history
+
+
+def test_timeouts_raise_the_provider_timeout(monkeypatch, tmp_path):
+    monkeypatch.setattr(deploy_history, "DB_PATH", tmp_path / "history.sqlite3")
+    for started in range(5):
+        deploy_history.record_deployment("run", "surge", started, 20.0, "success")
+    assert deploy_all.provider_timeout("surge") == deploy_all.MIN_TIMEOUT
+
+    deploy_history.record_deployment("run", "surge", 10, 60.0, "timeout")
+    first = deploy_all.provider_timeout("surge")
+    assert first == 60.0 * deploy_all.TIMEOUT_FACTOR + deploy_all.TIMEOUT_SLACK
+
+    # Each further timeout lengthens the next attempt, up to TIMEOUT
+    deploy_history.record_deployment("run", "surge", 11, first, "timeout")
+    assert first < deploy_all.provider_timeout("surge") <= deploy_all.TIMEOUT
@@ -0,0 +1,55 @@
+import subprocess
+
+import pytest
+
+import deploy_github_pages
+import deploy_history
+import file_hashes
+import process_runner
+
+
+def remote_git(remote, *args):
+    return subprocess.run(["git", "--git-dir", str(remote), *args], capture_output=True, text=True,
+                          check=True).stdout.split()
+
+
+@pytest.fixture
+def pages(monkeypatch, tmp_path):
+    """Point the deployer at a local bare repository and keep its state in tmp_path."""
+    remote = tmp_path / "remote.git"
+    subprocess.run(["git", "init", "-q", "--bare", str(remote)], check=True)
+    monkeypatch.setattr(deploy_github_pages, "GH_PAGES_REMOTE", str(remote))
+    monkeypatch.setattr(deploy_github_pages, "GH_PAGES_USE_CLI", False)
+    monkeypatch.setattr(deploy_github_pages, "WORKTREE_PATH", tmp_path / "worktree")
+    monkeypatch.setattr(deploy_history, "DB_PATH", tmp_path / "history.sqlite3")
+    monkeypatch.setattr(process_runner, "LOG_DIR", tmp_path / "logs")
+    monkeypatch.setattr(file_hashes, "INDEX_PATH", tmp_path / "hash_index.json")
+    monkeypatch.setattr(file_hashes, "_index", None)
+    dist = tmp_path / "dist"
+    (dist / "assets").mkdir(parents=True)
+    (dist / "index.html").write_text("<h1>v1</h1>")
+    (dist / "assets" / "index-BvQ3x9_k.js").write_text("console.log(1);")
+    return remote, dist
+
+
+def test_worktree_deploy_pushes_only_changes(pages):
+    remote, dist = pages
+    branch = deploy_github_pages.GH_PAGES_BRANCH
+
+    assert deploy_github_pages.deploy(dist)
+    assert sorted(remote_git(remote, "ls-tree", "-r", "--name-only", branch)) == [
+        ".nojekyll", "404.html", "assets/index-BvQ3x9_k.js", "index.html",
+    ]
+
+    # A delta commit: only the changed page (and its 404 copy) and the swapped chunk
+    (dist / "index.html").write_text("<h1>v2</h1>")
+    (dist / "assets" / "index-BvQ3x9_k.js").unlink()
+    (dist / "assets" / "index-C7x2Lm_q.js").write_text("console.log(2);")
+    assert deploy_github_pages.deploy(dist)
+    assert sorted(remote_git(remote, "diff", "--name-only", f"{branch}~1", branch)) == [
+        "404.html", "assets/index-BvQ3x9_k.js", "assets/index-C7x2Lm_q.js", "index.html",
+    ]
+
+    # Nothing changed: no new commit
+    assert deploy_github_pages.deploy(dist)
+    assert remote_git(remote, "rev-list", "--count", branch) == ["2"]
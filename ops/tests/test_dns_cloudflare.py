@@ -0,0 +1,91 @@
+from dns_cloudflare import plan_changes
+
+
+def zone(records, prune=False):
+    return {"zone_name": "example.com", "records": records, "prune": prune}
+
+
+def existing(record_id, content, type_="TXT", name="example.com"):
+    return {"id": record_id, "type": type_, "name": name, "content": content, "proxied": False, "ttl": 1}
+
+
+def test_unchanged_records_are_left_alone():
+    config = zone([{"type": "TXT", "name": "@", "content": "v=spf1 -all"}])
+    changes = plan_changes(config, [existing("r1", "v=spf1 -all")])
+    assert changes == {"posts": [], "patches": [], "deletes": []}
+
+
+def test_multi_value_set_matches_by_content():
+    config = zone([
+        {"type": "TXT", "name": "@", "content": "v=spf1 -all"},
+        {"type": "TXT", "name": "@", "content": "google-site-verification=abc"},
+    ])
+    actual = [existing("r1", "v=spf1 -all"), existing("r2", "stale")]
+
+    changes = plan_changes(config, actual)
+
+    # r1 already holds SPF and must not be overwritten; r2 is reused
+    assert changes["posts"] == []
+    assert [(p["id"], p["content"]) for p in changes["patches"]] == [("r2", "google-site-verification=abc")]
+    assert changes["deletes"] == []
+
+
+def test_prune_deletes_unmatched_records_under_managed_keys():
+    config = zone([
+        {"type": "TXT", "name": "@", "content": "v=spf1 -all"},
+        {"type": "TXT", "name": "@", "content": "google-site-verification=abc"},
+    ], prune=True)
+    actual = [
+        existing("r1", "v=spf1 -all"),
+        existing("r2", "google-site-verification=abc"),
+        existing("r3", "stale"),
+        existing("r4", "192.0.2.1", type_="A", name="old.example.com"),
+    ]
+
+    changes = plan_changes(config, actual)
+
+    assert changes["posts"] == [] and changes["patches"] == []
+    assert sorted(d["id"] for d in changes["deletes"]) == ["r3", "r4"]
+
+
+def test_each_existing_record_is_used_once():
+    config = zone([
+        {"type": "A", "name": "www", "content": "192.0.2.1"},
+        {"type": "A", "name": "www", "content": "192.0.2.2"},
+    ])
+    actual = [existing("r1", "192.0.2.9", type_="A", name="www.example.com")]
+
+    changes = plan_changes(config, actual)
+
+    assert len(changes["patches"]) == 1 and changes["patches"][0]["id"] == "r1"
+    assert [p["content"] for p in changes["posts"]] == ["192.0.2.2"]
+
+
+def test_cached_zone_is_validated_and_reconciled_on_drift(monkeypatch, tmp_path):
+    import dns_cache
+    import dns_cloudflare
+
+    config = zone([{"type": "TXT", "name": "@", "content": "v=spf1 -all"}])
+    synced = [existing("r1", "v=spf1 -all")]
+    monkeypatch.setattr(dns_cloudflare, "DNS_RECORDS", [config])
+    monkeypatch.setattr(dns_cloudflare, "CLOUDFLARE_API_TOKEN", "token")
+    monkeypatch.setattr(dns_cloudflare, "CLOUDFLARE_EMAIL", "ops@example.com")
+    monkeypatch.setattr(dns_cache, "CACHE_PATH", tmp_path / "dns_cache.json")
+    monkeypatch.setattr(dns_cache, "_entries", None)
+    dns_cache.put("records", "example.com", {
+        "zone_id": "z1", "config": dns_cloudflare.config_digest(config), "records": synced,
+    })
+
+    applied = []
+    monkeypatch.setattr(dns_cloudflare, "apply_changes", lambda session, zone_id, changes: applied.append(changes)
+                        or {"deletes": [], "patches": changes["patches"], "posts": []})
+
+    # Unchanged zone: one listing, nothing applied
+    monkeypatch.setattr(dns_cloudflare, "list_records", lambda session, zone_id: list(synced))
+    assert dns_cloudflare.main()
+    assert applied == []
+
+    # Edited outside the script: the drift is detected and repaired
+    monkeypatch.setattr(dns_cloudflare, "list_records", lambda session, zone_id: [existing("r1", "tampered")])
+    assert dns_cloudflare.main()
+    assert [p["content"] for p in applied[0]["patches"]] == ["v=spf1 -all"]
@@ -0,0 +1,23 @@
+import dns_cache
+import dns_spaceship
+
+
+def test_cached_nameservers_are_validated(monkeypatch, tmp_path):
+    monkeypatch.setattr(dns_cache, "CACHE_PATH", tmp_path / "dns_cache.json")
+    monkeypatch.setattr(dns_cache, "_entries", None)
+    dns_cache.put("nameservers", "example.com", dns_spaceship.CLOUDFLARE_NS)
+
+    # Changed at the registrar after the last run
+    registrar = {"nameservers": ["ns1.elsewhere.net", "ns2.elsewhere.net"]}
+    updates = []
+    monkeypatch.setattr(dns_spaceship, "get_domain_info", lambda session, domain: (dict(registrar), None))
+    monkeypatch.setattr(dns_spaceship, "update_nameservers",
+                        lambda session, domain, nameservers: (updates.append(nameservers) or True, None))
+
+    assert dns_spaceship.sync_domain(None, "example.com")[0]
+    assert updates == [dns_spaceship.CLOUDFLARE_NS]
+
+    # Opting in to trust the cache skips the request entirely
+    monkeypatch.setattr(dns_spaceship, "DNS_TRUST_CACHE", True)
+    monkeypatch.setattr(dns_spaceship, "get_domain_info", None)
+    assert dns_spaceship.sync_domain(None, "example.com") == (True, ["✅ Nameservers already configured correctly! (cached)"])
@@ -0,0 +1,98 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+import dns_verify
+
+
+def reply(query: bytes, rdata: bytes, cut: int = 0) -> bytes:
+    """Answer a query with one A record (pointing back at the question name)."""
+    query_id = struct.unpack("!H", query[:2])[0]
+    header = struct.pack("!HHHHHH", query_id, 0x8180, 1, 1, 0, 0)
+    answer = struct.pack("!HHHIH", 0xC00C, 1, 1, 60, len(rdata)) + rdata
+    message = header + query[12:] + answer
+    return message[:len(message) - cut] if cut else message
+
+
+@pytest.fixture
+def stub_server():
+    """Start a local UDP resolver that answers with whatever `respond` returns."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.1)
+    state = {"respond": None, "running": True}
+
+    def serve():
+        while state["running"]:
+            try:
+                data, addr = sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            sock.sendto(state["respond"](data), addr)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield state, f"127.0.0.1:{sock.getsockname()[1]}"
+    state["running"] = False
+    thread.join()
+    sock.close()
+
+
+CHECK = {"name": "img.example.com", "type": "A", "expected": ["192.0.2.1"]}
+
+
+def test_good_reply_verifies(stub_server):
+    state, resolver = stub_server
+    state["respond"] = lambda query: reply(query, bytes([192, 0, 2, 1]))
+    assert dns_verify.verify([CHECK], resolvers=[resolver], timeout=2)
+
+
+@pytest.mark.parametrize("respond", [
+    lambda query: reply(query, bytes([192, 0, 2, 1]), cut=6),  # answer cut short
+    lambda query: reply(query, bytes([192, 0, 2])),  # A rdata of the wrong length
+])
+def test_malformed_reply_fails_without_crashing(stub_server, respond):
+    state, resolver = stub_server
+    state["respond"] = respond
+    assert not dns_verify.verify([CHECK], resolvers=[resolver], timeout=0.5)
+
+
+def test_truncated_answer_raises_dns_error():
+    query = dns_verify.build_query("img.example.com", "A", 7)
+    with pytest.raises(dns_verify.DNSError):
+        dns_verify.parse_response(reply(query, bytes([192, 0, 2, 1]), cut=6), 7)
+
+
+def multi_reply(query: bytes, addresses: list[bytes]) -> bytes:
+    """Answer a query with one A record per address."""
+    query_id = struct.unpack("!H", query[:2])[0]
+    header = struct.pack("!HHHHHH", query_id, 0x8180, 1, len(addresses), 0, 0)
+    answers = b"".join(struct.pack("!HHHIH", 0xC00C, 1, 1, 60, 4) + a for a in addresses)
+    return header + query[12:] + answers
+
+
+ZONE = {"zone_name": "example.com", "records": [
+    {"type": "A", "name": "www", "content": "192.0.2.1"},
+    {"type": "A", "name": "www", "content": "192.0.2.2"},
+    {"type": "TXT", "name": "@", "content": "managed"},
+    {"type": "SRV", "name": "_sip._tcp", "content": "sip.example.com"},
+]}
+
+
+def test_record_checks_group_record_sets():
+    checks = dns_verify.record_checks([ZONE])
+    assert checks == [
+        {"name": "www.example.com", "type": "A", "expected": ["192.0.2.1", "192.0.2.2"], "exact": False},
+        {"name": "example.com", "type": "TXT", "expected": ["managed"], "exact": False},
+    ]
+    assert all(check["exact"] for check in dns_verify.record_checks([{**ZONE, "prune": True}]))
+
+
+def test_record_set_verifies_and_unmanaged_values_need_prune(stub_server):
+    state, resolver = stub_server
+    state["respond"] = lambda query: multi_reply(query, [bytes([192, 0, 2, n]) for n in (1, 2, 3)])
+    check = dns_verify.record_checks([ZONE])[0]
+    assert dns_verify.verify([check], resolvers=[resolver], timeout=2)
+    assert not dns_verify.verify([{**check, "exact": True}], resolvers=[resolver], timeout=0.5)
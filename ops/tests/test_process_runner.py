@@ -0,0 +1,25 @@
+import os
+import sys
+import time
+
+import pytest
+
+import process_runner
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="process groups are POSIX only")
+def test_interrupt_kills_the_process_group(monkeypatch, tmp_path):
+    monkeypatch.setattr(process_runner, "LOG_DIR", tmp_path)
+    children = []
+
+    def interrupted_wait(proc, deadline):
+        children.append(proc)
+        time.sleep(0.2)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(process_runner, "_wait", interrupted_wait)
+    with pytest.raises(KeyboardInterrupt):
+        process_runner.run_process(["sh", "-c", "sleep 37; true"])
+
+    with pytest.raises(ProcessLookupError):
+        os.killpg(children[0].pid, 0)
@@ -0,0 +1,13 @@
+import process_runner
+import providers
+
+
+def test_provider_that_fails_to_import_fails_alone(monkeypatch, tmp_path):
+    monkeypatch.setattr(process_runner, "LOG_DIR", tmp_path / "logs")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    (tmp_path / "deploy_broken.py").write_text("raise RuntimeError('missing config')\n")
+
+    result = providers.run_provider("deploy_broken.py", tmp_path / "artifact", timeout=5)
+
+    assert result["returncode"] == 1 and not result["timed_out"]
+    assert "RuntimeError: missing config" in result["tail"]
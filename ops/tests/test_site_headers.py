@@ -0,0 +1,24 @@
+from site_headers import HASHED_NAME, header_rules
+
+
+def test_hashed_name_matches_only_vite_hashes():
+    for path in ["assets/index-BvQ3x9_k.js", "assets/style-D4f2a1c9.css", "assets/ort-Ab12cd34.wasm",
+                 "assets/index-B-x9Qw3k.js", "assets/upscale-worker--x9Qw3kA.js"]:
+        assert HASHED_NAME.search(path), path
+    for path in ["assets/face-landmarks.json", "assets/logo-wordmark.svg",
+                 "assets/ort-wasm-simd-threaded.wasm", "assets/my-big-file.js", "assets/index-BvQ3x9_k.js.map",
+                 "index.html"]:
+        assert not HASHED_NAME.search(path), path
+
+
+def test_unhashed_assets_are_not_immutable():
+    rules = header_rules(["index.html", "assets/index-BvQ3x9_k.js", "assets/logo-wordmark.svg"])
+    assert rules["/assets/index-BvQ3x9_k.js"]["Cache-Control"].endswith("immutable")
+    assert "/assets/logo-wordmark.svg" not in rules
+    assert "Cache-Control" not in rules.get("/assets/*", {})
+
+
+def test_hashes_with_dashes_keep_the_blanket_rule():
+    rules = header_rules(["index.html", "assets/index-BvQ3x9_k.js", "assets/vendor-B-x9Qw3k.js"])
+    assert rules["/assets/*"]["Cache-Control"].endswith("immutable")
+    assert "/assets/vendor-B-x9Qw3k.js" not in rules